@@ -9,9 +9,12 @@ from .utils.config import (
     CORS_ORIGINS,
     CORS_CREDENTIALS,
     CORS_METHODS,
-    CORS_HEADERS
+    CORS_HEADERS,
+    JOBS_DIR
 )
 from .routes import video, downloads, health
+from .services.executor import shutdown_executors
+from .services.file_manager import cleanup_job_dir
 
 # Configurar logging para produção
 logging.basicConfig(
@@ -46,8 +49,11 @@ async def startup_event():
     """Evento executado ao iniciar a aplicação"""
     logger.info("🚀 Iniciando YouTube Downloader API...")
     logger.info(f"📦 Versão: {API_VERSION}")
+    # Diretórios de jobs que sobraram de uma execução interrompida
+    cleanup_job_dir(JOBS_DIR)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Evento executado ao encerrar a aplicação"""
     logger.info("👋 Encerrando YouTube Downloader API...")
+    shutdown_executors()
@@ -1,11 +1,19 @@
 from pydantic import BaseModel, HttpUrl
-from typing import Optional
+from typing import List, Literal, Optional
 
 class VideoRequest(BaseModel):
     url: HttpUrl
     quality: Optional[str] = "best"
     format: Optional[str] = "mp4"
     audio_only: Optional[bool] = False
+    # Orçamentos opcionais: tamanho máximo do arquivo e tempo máximo de download
+    max_bytes: Optional[int] = None
+    max_seconds: Optional[float] = None
+    # Saída MP4: 'faststart' ou 'fragmented' (None = MP4_OUTPUT_MODE do servidor)
+    mp4_mode: Optional[Literal['faststart', 'fragmented']] = None
+    # Containers que o cliente reproduz (ex.: ['mp4', 'webm']): o arquivo entregue
+    # pelo yt-dlp num deles é servido como está, sem remux para o container pedido
+    accept_containers: Optional[List[str]] = None
 
 class VideoInfo(BaseModel):
     title: str
@@ -17,7 +25,7 @@ class VideoInfo(BaseModel):
     thumbnail: Optional[str] = None
 
 class DownloadProgress(BaseModel):
-    status: str  # 'downloading', 'converting', 'completed', 'error'
+    status: str  # 'queued', 'downloading', 'converting', 'completed', 'error'
     progress_percent: Optional[float] = 0.0
     downloaded_bytes: Optional[int] = 0
     total_bytes: Optional[int] = 0
@@ -26,6 +34,7 @@ class DownloadProgress(BaseModel):
     current_strategy: Optional[str] = None
     message: Optional[str] = None
     filename: Optional[str] = None
+    queue_position: Optional[int] = None
 
 class DownloadResponse(BaseModel):
     status: str
@@ -34,6 +43,7 @@ class DownloadResponse(BaseModel):
     file_path: Optional[str] = None
     video_info: Optional[VideoInfo] = None
     download_progress: Optional[DownloadProgress] = None
+    format_id: Optional[str] = None  # itag(s) escolhido(s), ex.: '137+140'
 
 class DiagnosisResponse(BaseModel):
     original_url: str
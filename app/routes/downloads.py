@@ -3,6 +3,7 @@ from fastapi.responses import FileResponse
 import os
 import logging
 from ..services.file_manager import list_all_downloads, delete_file, get_file_path
+from ..services.executor import run_blocking
 from ..utils.config import DOWNLOAD_DIR
 
 logger = logging.getLogger(__name__)
@@ -12,7 +13,7 @@ router = APIRouter(prefix="/downloads", tags=["downloads"])
 async def list_downloads():
     """Lista todos os arquivos baixados"""
     try:
-        return list_all_downloads()
+        return await run_blocking(list_all_downloads)
     except Exception as e:
         logger.error(f"Erro ao listar downloads: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -48,6 +49,12 @@ async def download_file(filename: str):
             media_type = "audio/mpeg"
         elif filename.endswith('.webm'):
             media_type = "video/webm"
+        elif filename.endswith('.mkv'):
+            media_type = "video/x-matroska"
+        elif filename.endswith('.m4a'):
+            media_type = "audio/mp4"
+        elif filename.endswith(('.opus', '.ogg')):
+            media_type = "audio/ogg"
 
         # Retornar o arquivo
         return FileResponse(
@@ -4,6 +4,15 @@ import subprocess
 import logging
 
 from ..utils.ffmpeg_locator import get_ffmpeg_path, verify_ffmpeg_available
+from ..services.executor import run_blocking
+from ..services.strategy_scoreboard import strategy_scoreboard
+from ..services.circuit_breaker import circuit_breakers
+from ..services.scheduler import download_scheduler
+from ..services.result_store import result_store
+from ..services.format_screening import format_rejections
+from ..services.media_probe import probe_cache
+from ..services.postprocess_planner import postprocess_stats
+from ..services.audio_stream import stream_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["health"])
@@ -24,13 +33,15 @@ async def health_check():
         # Verificar yt-dlp
         yt_dlp_version = "unknown"
         try:
-            result = subprocess.run(['yt-dlp', '--version'], capture_output=True, text=True, timeout=5)
+            result = await run_blocking(
+                subprocess.run, ['yt-dlp', '--version'], capture_output=True, text=True, timeout=5
+            )
             yt_dlp_version = result.stdout.strip() if result.returncode == 0 else "error"
         except:
             yt_dlp_version = "not installed"
 
         # 🔧 Verificar ffmpeg usando o localizador
-        ffmpeg_available = verify_ffmpeg_available()
+        ffmpeg_available = await run_blocking(verify_ffmpeg_available)
         ffmpeg_path = get_ffmpeg_path() if ffmpeg_available else "not found"
 
         # Verificar diretório de downloads
@@ -57,6 +68,16 @@ async def health_check():
                     "exists": downloads_dir_exists,
                     "writable": downloads_dir_writable,
                     "path": str(DOWNLOAD_DIR)
+                },
+                "download_scheduler": download_scheduler.stats(),
+                "result_cache": result_store.stats(),
+                "format_screening": format_rejections.snapshot(),
+                "probe_cache": probe_cache.stats(),
+                "postprocessing": postprocess_stats.snapshot(),
+                "audio_streaming": stream_stats.snapshot(),
+                "strategy_breakers": {
+                    "bypassed": circuit_breakers.bypassed(),
+                    "breakers": circuit_breakers.snapshot()
                 }
             }
         }
@@ -67,6 +88,13 @@ async def health_check():
             "message": str(e)
         }
 
+@router.get("/health/strategies")
+async def strategy_scores():
+    """Placar das estratégias do yt-dlp (somente leitura)"""
+    return {
+        "scoreboard": strategy_scoreboard.snapshot()
+    }
+
 @router.options("/video/info")
 @router.options("/video/download")
 @router.options("/video/download-stream")
@@ -7,8 +7,13 @@ from fastapi.responses import StreamingResponse
 import json
 
 from ..models.schemas import VideoRequest, VideoInfo, DownloadResponse, DiagnosisResponse, DownloadProgress
-from ..services.youtube import get_video_info_robust, download_video_robust
-from ..services.file_manager import find_downloaded_file, get_file_path
+from ..services.youtube import get_video_info_cached, download_video_robust
+from ..services.file_manager import get_file_path
+from ..services.executor import run_blocking
+from ..services.video_errors import TerminalJobError
+from ..services.scheduler import download_scheduler, QueueFullError
+from ..services.single_flight import download_flights, info_flights, download_key, info_key
+from ..services.result_store import result_store
 from ..utils.helpers import normalize_youtube_url, is_youtube_short
 
 logger = logging.getLogger(__name__)
@@ -21,7 +26,9 @@ download_progress_store: Dict[str, DownloadProgress] = {}
 async def get_video_information(request: VideoRequest):
     """Obtém informações do vídeo sem baixar"""
     try:
-        info = get_video_info_robust(str(request.url))
+        url = str(request.url)
+        # Requisições simultâneas para o mesmo vídeo compartilham uma única extração
+        info = await info_flights.run(info_key(url), lambda: run_blocking(get_video_info_cached, url))
 
         # Extrair thumbnail - YouTube fornece várias opções, pegar a melhor
         thumbnail_url = None
@@ -40,6 +47,8 @@ async def get_video_information(request: VideoRequest):
             description=info.get('description', '')[:500] if info.get('description') else None,
             thumbnail=thumbnail_url
         )
+    except TerminalJobError:
+        raise
     except Exception as e:
         logger.error(f"Erro ao obter informações do vídeo: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -49,13 +58,20 @@ async def download_video(request: VideoRequest):
     """Baixa o vídeo do YouTube (incluindo Shorts) - Versão robusta anti-403"""
     try:
         # Usar a nova função robusta de download
-        info = download_video_robust(str(request.url), request)
+        # Mesmo vídeo/formato já baixado: servir o arquivo existente
+        info = await run_blocking(result_store.lookup, request)
+        if info is None:
+            # Requisições idênticas em andamento compartilham o mesmo job
+            flight, _ = download_flights.join(
+                download_key(request),
+                lambda publish: download_scheduler.submit(download_video_robust, str(request.url), request, publish)
+            )
+            info = await flight.job.wait()
 
         # Verificar se é um YouTube Short
         is_short = is_youtube_short(str(request.url))
 
-        title = info.get('title', 'video')
-        downloaded_file = find_downloaded_file(title)
+        downloaded_file = info.get('final_filename')
 
         # Extrair thumbnail - YouTube fornece várias opções, pegar a melhor
         thumbnail_url = None
@@ -82,9 +98,12 @@ async def download_video(request: VideoRequest):
             message=f"{video_type} baixado com sucesso!",
             filename=downloaded_file,
             file_path=get_file_path(downloaded_file) if downloaded_file else None,
-            video_info=video_info
+            video_info=video_info,
+            format_id=info.get('format_id')
         )
 
+    except (TerminalJobError, QueueFullError):
+        raise
     except Exception as e:
         logger.error(f"Erro no download: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Erro ao baixar vídeo: {str(e)}")
@@ -96,17 +115,6 @@ async def download_video_stream(request: VideoRequest):
     async def event_generator():
         """Gerador de eventos SSE para progresso do download"""
 
-        # Usar uma lista compartilhada para progresso em tempo real
-        import threading
-        progress_queue = []
-        progress_lock = threading.Lock()
-        download_complete = threading.Event()
-
-        def progress_callback(progress: DownloadProgress):
-            """Callback para receber atualizações de progresso"""
-            with progress_lock:
-                progress_queue.append(progress)
-
         try:
             # Enviar evento inicial
             initial_data = {
@@ -115,46 +123,62 @@ async def download_video_stream(request: VideoRequest):
                 'progress_percent': 0.0
             }
             yield f"data: {json.dumps(initial_data)}\n\n"
-            await asyncio.sleep(0.1)
 
-            # Executar download em thread separada
-            loop = asyncio.get_event_loop()
+            # Mesmo vídeo/formato já baixado: servir o arquivo existente
+            info = await run_blocking(result_store.lookup, request)
+            if info is None:
+                await asyncio.sleep(0.1)
+
+                # Enfileirar o download no agendador (workers e fila limitados), ou
+                # anexar-se a um download idêntico que já está em andamento
+                flight, is_leader = download_flights.join(
+                    download_key(request),
+                    lambda publish: download_scheduler.submit(download_video_robust, str(request.url), request, publish)
+                )
+                job = flight.job
+                download_task = asyncio.ensure_future(job.wait())
+
+                if not is_leader:
+                    attached = DownloadProgress(
+                        status='starting',
+                        message='Download idêntico já em andamento, acompanhando o progresso...'
+                    )
+                    yield f"data: {attached.model_dump_json()}\n\n"
+
+                # Enviar atualizações em tempo real conforme chegam (histórico compartilhado do job)
+                last_sent_index = 0
+                last_queue_position = None
+
+                while not download_task.done():
+                    # Informar a posição na fila enquanto o job aguarda um worker
+                    queue_position = job.queue_position
+                    if queue_position and queue_position != last_queue_position:
+                        queued = DownloadProgress(
+                            status='queued',
+                            queue_position=queue_position,
+                            message=f'Aguardando na fila (posição {queue_position})...'
+                        )
+                        yield f"data: {queued.model_dump_json()}\n\n"
+                    last_queue_position = queue_position
+
+                    # Enviar apenas os novos progressos (não enviados ainda)
+                    events, last_sent_index = flight.events_since(last_sent_index)
+                    for progress in events:
+                        yield f"data: {progress.model_dump_json()}\n\n"
+
+                    await asyncio.sleep(0.1)  # Verificar a cada 100ms
 
-            # Iniciar download em background
-            download_task = loop.run_in_executor(
-                None,
-                lambda: download_video_robust(str(request.url), request, progress_callback)
-            )
+                # Aguardar conclusão do download
+                info = await download_task
 
-            # Enviar atualizações em tempo real conforme chegam
-            last_sent_index = 0
-
-            while not download_task.done():
-                # Verificar se há novos progressos para enviar
-                with progress_lock:
-                    if len(progress_queue) > last_sent_index:
-                        # Enviar apenas os novos progressos (não enviados ainda)
-                        for i in range(last_sent_index, len(progress_queue)):
-                            progress = progress_queue[i]
-                            yield f"data: {progress.model_dump_json()}\n\n"
-                        last_sent_index = len(progress_queue)
-
-                await asyncio.sleep(0.1)  # Verificar a cada 100ms
-
-            # Aguardar conclusão do download
-            info = await download_task
-
-            # Enviar últimos progressos que podem ter chegado após o loop
-            with progress_lock:
-                if len(progress_queue) > last_sent_index:
-                    for i in range(last_sent_index, len(progress_queue)):
-                        progress = progress_queue[i]
-                        yield f"data: {progress.model_dump_json()}\n\n"
+                # Enviar últimos progressos que podem ter chegado após o loop
+                events, last_sent_index = flight.events_since(last_sent_index)
+                for progress in events:
+                    yield f"data: {progress.model_dump_json()}\n\n"
 
             # Obter informações finais do arquivo
             is_short = is_youtube_short(str(request.url))
-            title = info.get('title', 'video')
-            downloaded_file = find_downloaded_file(title)
+            downloaded_file = info.get('final_filename')
 
             # Extrair thumbnail
             thumbnail_url = None
@@ -180,6 +204,7 @@ async def download_video_stream(request: VideoRequest):
                 'filename': downloaded_file,
                 'file_path': get_file_path(downloaded_file) if downloaded_file else None,
                 'video_info': video_info,
+                'format_id': info.get('format_id'),
                 'progress_percent': 100.0
             }
 
@@ -195,6 +220,9 @@ async def download_video_stream(request: VideoRequest):
                 'message': f'Erro ao baixar vídeo: {str(e)}',
                 'progress_percent': 0.0
             }
+            if isinstance(e, TerminalJobError):
+                error_response['error_code'] = e.code
+                error_response['message'] = e.detail['message']
             yield f"data: {json.dumps(error_response)}\n\n"
 
     return StreamingResponse(
@@ -224,12 +252,15 @@ async def diagnose_video_url(request: VideoRequest):
     )
 
     try:
-        info = get_video_info_robust(url)
+        info = await info_flights.run(info_key(url), lambda: run_blocking(get_video_info_cached, url))
         diagnosis.successful_strategy = "robust_extraction"
         diagnosis.video_available = True
         diagnosis.title = info.get('title', 'N/A')
         diagnosis.duration = info.get('duration')
         diagnosis.formats_available = len(info.get('formats', []))
+    except TerminalJobError as e:
+        diagnosis.video_available = False
+        diagnosis.errors.append(e.detail)
     except Exception as e:
         diagnosis.video_available = False
         diagnosis.errors.append(str(e))
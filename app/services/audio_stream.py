@@ -0,0 +1,181 @@
+"""
+Transcodificação de áudio em streaming.
+
+Quando o cliente pede MP3 explicitamente, os bytes do formato de áudio vão
+do download direto para o stdin do ffmpeg: a recodificação acontece junto
+com o download e nenhum arquivo intermediário é gravado. Se o stream falhar
+(protocolo não suportado, conexão interrompida, erro do ffmpeg), o chamador
+volta ao caminho em duas etapas (download completo + planejador).
+"""
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import yt_dlp
+from yt_dlp.networking import Request
+
+from ..models.schemas import VideoRequest
+from ..utils.config import AUDIO_STREAM_RANGE_SIZE, AUDIO_STREAM_TRANSCODE, FFMPEG_REENCODE_TIMEOUT_FACTOR
+from .ffmpeg_runner import conversion_timeout, run_ffmpeg
+from .format_selector import resolve_container
+from .media_probe import probe_file
+from .postprocess_planner import AUDIO_ENCODERS
+
+logger = logging.getLogger(__name__)
+
+# Protocolos em que o formato é um único arquivo HTTP (DASH/HLS fragmentados ficam no caminho normal)
+STREAMABLE_PROTOCOLS = ('http', 'https')
+
+READ_BLOCK_SIZE = 64 * 1024
+
+CONTENT_RANGE_PATTERN = re.compile(r'bytes \d+-\d+/(\d+)')
+
+# Fração mínima da duração informada pelo extrator que o MP3 precisa ter
+MIN_DURATION_RATIO = 0.98
+
+def can_stream_transcode(info: Dict[str, Any], request: VideoRequest) -> bool:
+    """MP3 pedido explicitamente e um único formato baixável por HTTP"""
+    return (
+        AUDIO_STREAM_TRANSCODE
+        and resolve_container(request) == 'mp3'
+        and not info.get('requested_formats')
+        and info.get('protocol') in STREAMABLE_PROTOCOLS
+        and bool(info.get('url'))
+    )
+
+def iter_http_chunks(ydl: yt_dlp.YoutubeDL, fmt: Dict[str, Any],
+                     progress_hooks: List[Callable[[Dict[str, Any]], None]]) -> Iterator[bytes]:
+    """
+    Lê o formato em requisições Range sucessivas (pelo urlopen do yt-dlp, com
+    cookies/proxy da estratégia) e chama os progress_hooks no formato do yt-dlp.
+    """
+    headers = dict(fmt.get('http_headers') or {})
+    total = fmt.get('filesize') or None
+    position = 0
+    start = time.perf_counter()
+
+    def report(status: str) -> None:
+        elapsed = max(time.perf_counter() - start, 1e-6)
+        speed = position / elapsed
+        event = {
+            'status': status,
+            'downloaded_bytes': position,
+            'total_bytes': total,
+            'speed': speed,
+            'eta': int((total - position) / speed) if total and speed else None,
+            'filename': '-',
+        }
+        for hook in progress_hooks:
+            hook(event)
+
+    while total is None or position < total:
+        requested = AUDIO_STREAM_RANGE_SIZE
+        end = position + requested - 1
+        response = ydl.urlopen(Request(fmt['url'], headers={**headers, 'Range': f'bytes={position}-{end}'}))
+        try:
+            match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range') or '')
+            if match:
+                total = int(match.group(1))
+            ranged = response.status == 206
+            received = 0
+            while True:
+                block = response.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                received += len(block)
+                position += len(block)
+                report('downloading')
+                yield block
+        finally:
+            response.close()
+
+        # Servidor ignorou o Range (arquivo inteiro numa resposta) ou o arquivo acabou antes do intervalo
+        if not ranged or received < requested:
+            if total is not None and position < total:
+                raise IOError(f"stream interrompido em {position} de {total} bytes")
+            break
+
+    report('finished')
+
+def _output_complete(output_path: str, duration: Optional[float]) -> bool:
+    """
+    O ffmpeg sai com 0 mesmo quando não consegue ler a entrada pelo pipe (ex.: MP4
+    com o moov no fim): conferir se o MP3 tem áudio e a duração esperada.
+    """
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return False
+    probe = probe_file(output_path)
+    if probe is None or probe.audio is None or not probe.duration:
+        return False
+    return not duration or probe.duration >= duration * MIN_DURATION_RATIO
+
+class StreamTranscodeStats:
+    """Contadores do modo de transcodificação em streaming"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.completed = 0
+        self.fallbacks = 0
+        self.seconds = 0.0
+
+    def record(self, success: bool, elapsed: float) -> None:
+        with self._lock:
+            self.attempts += 1
+            if success:
+                self.completed += 1
+                self.seconds += elapsed
+            else:
+                self.fallbacks += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': AUDIO_STREAM_TRANSCODE,
+                'attempts': self.attempts,
+                'completed': self.completed,
+                'fallbacks': self.fallbacks,
+                'avg_seconds': round(self.seconds / self.completed, 3) if self.completed else None,
+            }
+
+stream_stats = StreamTranscodeStats()
+
+def stream_transcode_audio(ydl: yt_dlp.YoutubeDL, info: Dict[str, Any], output_path: str,
+                           progress_hooks: List[Callable[[Dict[str, Any]], None]]) -> Optional[str]:
+    """
+    Baixa o formato escolhido e transcodifica para MP3 ao mesmo tempo.
+
+    Retorna output_path, ou None (sem deixar arquivo parcial) para o chamador
+    usar o caminho em duas etapas.
+    """
+    duration = info.get('duration')
+    args = ['-y', '-i', 'pipe:0', '-vn', '-c:a', *AUDIO_ENCODERS['mp3'], output_path]
+    logger.info(f"🎶 Transcodificando para MP3 durante o download (formato {info.get('format_id')})")
+
+    start = time.perf_counter()
+    try:
+        chunks = iter_http_chunks(ydl, info, progress_hooks)
+        result = run_ffmpeg(args, duration, None, conversion_timeout(duration, FFMPEG_REENCODE_TIMEOUT_FACTOR), chunks)
+    except Exception as e:
+        logger.warning(f"⚠️ Transcodificação em streaming falhou: {e}")
+        result = None
+    elapsed = time.perf_counter() - start
+
+    success = bool(result and result.ok and _output_complete(output_path, duration))
+    stream_stats.record(success, elapsed)
+    if success:
+        logger.info(f"✅ MP3 pronto em {elapsed:.1f}s (download e transcodificação simultâneos)")
+        return output_path
+
+    if result is not None:
+        if result.input_error or result.timed_out:
+            reason = result.input_error or 'timeout'
+        else:
+            reason = 'saída incompleta' if result.returncode == 0 else result.stderr[-500:].strip()
+        logger.warning(f"⚠️ Transcodificação em streaming falhou ({reason}), voltando ao download completo")
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    return None
@@ -0,0 +1,108 @@
+"""
+Circuit breaker por estratégia do yt-dlp.
+
+Quando um player client começa a devolver 403 ou apenas storyboards, cada
+job pagaria socket_timeout × retries nele. Após N falhas consecutivas o
+breaker abre e a estratégia é pulada durante o cooldown; ao fim do cooldown
+uma única tentativa de teste é liberada (half-open).
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from ..utils.config import CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreakerRegistry:
+    """Estado dos breakers, indexado por (escopo, estratégia)"""
+
+    def __init__(self, threshold: int, cooldown: int):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._breakers: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _breaker(self, scope: str, name: str) -> Dict[str, Any]:
+        return self._breakers.setdefault(f"{scope}:{name}", {
+            'state': CLOSED,
+            'consecutive_failures': 0,
+            'opened_at': None,
+            'probe_in_flight': False,
+        })
+
+    def allow(self, scope: str, name: str) -> bool:
+        """Indica se a estratégia pode ser tentada agora"""
+        with self._lock:
+            breaker = self._breaker(scope, name)
+            if breaker['state'] == CLOSED:
+                return True
+
+            if breaker['state'] == OPEN:
+                if time.time() - breaker['opened_at'] < self.cooldown:
+                    return False
+                # Cooldown terminou: liberar uma única tentativa de teste
+                breaker['state'] = HALF_OPEN
+                breaker['probe_in_flight'] = True
+                logger.info(f"🔌 Breaker {scope}:{name} half-open, liberando tentativa de teste")
+                return True
+
+            # HALF_OPEN: só uma tentativa de teste por vez
+            if breaker['probe_in_flight']:
+                return False
+            breaker['probe_in_flight'] = True
+            return True
+
+    def record_success(self, scope: str, name: str) -> None:
+        with self._lock:
+            breaker = self._breaker(scope, name)
+            if breaker['state'] != CLOSED:
+                logger.info(f"🔌 Breaker {scope}:{name} fechado novamente")
+            breaker.update(state=CLOSED, consecutive_failures=0, opened_at=None, probe_in_flight=False)
+
+    def record_failure(self, scope: str, name: str) -> None:
+        with self._lock:
+            breaker = self._breaker(scope, name)
+            breaker['consecutive_failures'] += 1
+            breaker['probe_in_flight'] = False
+
+            if breaker['state'] == HALF_OPEN or breaker['consecutive_failures'] >= self.threshold:
+                if breaker['state'] != OPEN:
+                    logger.warning(
+                        f"🔌 Breaker {scope}:{name} aberto após {breaker['consecutive_failures']} falhas "
+                        f"(cooldown de {self.cooldown}s)"
+                    )
+                breaker['state'] = OPEN
+                breaker['opened_at'] = time.time()
+
+    def release(self, scope: str, name: str) -> None:
+        """Devolve a vaga de teste de uma tentativa que não rodou ou terminou sem culpa da estratégia"""
+        with self._lock:
+            self._breaker(scope, name)['probe_in_flight'] = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado atual dos breakers para o /health"""
+        now = time.time()
+        with self._lock:
+            result = {}
+            for key, breaker in self._breakers.items():
+                remaining = None
+                if breaker['state'] == OPEN:
+                    remaining = max(0, round(self.cooldown - (now - breaker['opened_at'])))
+                result[key] = {
+                    'state': breaker['state'],
+                    'consecutive_failures': breaker['consecutive_failures'],
+                    'cooldown_remaining_seconds': remaining,
+                }
+            return result
+
+    def bypassed(self) -> list:
+        """Estratégias atualmente puladas"""
+        return [key for key, value in self.snapshot().items() if value['state'] != CLOSED]
+
+circuit_breakers = CircuitBreakerRegistry(CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN)
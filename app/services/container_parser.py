@@ -0,0 +1,313 @@
+"""
+Leitura de cabeçalhos MP4/M4A e WebM em Python puro.
+
+Duração, codecs, resolução e contagem de frames ficam no box 'moov' do MP4
+ou nos elementos Info/Tracks do cabeçalho EBML do WebM. Ler esses campos
+direto de um mmap custa microssegundos, contra dezenas de milissegundos (e
+um processo) do ffprobe. O resultado tem o mesmo formato do JSON do ffprobe,
+para ser consumido pelo serviço de probe.
+"""
+import logging
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MP4_EXTENSIONS = ('.mp4', '.m4a', '.m4v', '.mov')
+WEBM_EXTENSIONS = ('.webm', '.mkv')
+
+# Códigos de amostra do MP4 -> nome do codec no ffprobe
+MP4_CODECS = {
+    'avc1': 'h264', 'avc3': 'h264', 'hvc1': 'hevc', 'hev1': 'hevc', 'av01': 'av1',
+    'vp09': 'vp9', 'vp08': 'vp8', 'mp4v': 'mpeg4', 'jpeg': 'mjpeg', 'mjpa': 'mjpeg',
+    'mp4a': 'aac', 'Opus': 'opus', 'fLaC': 'flac', 'ac-3': 'ac3', 'ec-3': 'eac3', '.mp3': 'mp3',
+}
+
+# CodecID do Matroska/WebM -> nome do codec no ffprobe
+WEBM_CODECS = {
+    'V_VP8': 'vp8', 'V_VP9': 'vp9', 'V_AV1': 'av1', 'V_MPEG4/ISO/AVC': 'h264',
+    'V_MPEGH/ISO/HEVC': 'hevc', 'V_MJPEG': 'mjpeg', 'A_OPUS': 'opus', 'A_VORBIS': 'vorbis',
+    'A_AAC': 'aac', 'A_MPEG/L3': 'mp3', 'A_FLAC': 'flac', 'A_AC3': 'ac3',
+}
+
+class HeaderParseError(Exception):
+    """O cabeçalho não pôde ser lido (arquivo truncado, fragmentado ou não suportado)"""
+
+def _fraction(numerator: Optional[float], denominator: Optional[float]) -> Optional[str]:
+    if not numerator or not denominator:
+        return None
+    return f"{numerator:.6f}/{denominator:.6f}"
+
+# ---------------------------------------------------------------------------
+# MP4 (ISO BMFF)
+# ---------------------------------------------------------------------------
+
+def _mp4_boxes(data, start: int, end: int) -> Iterator[Tuple[str, int, int]]:
+    """(tipo, início do conteúdo, fim) de cada box entre start e end"""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise HeaderParseError(f"box {box_type!r} inválido em {offset}")
+        yield box_type.decode('latin-1'), offset + header, offset + size
+        offset += size
+
+def _mp4_child(data, start: int, end: int, *path: str) -> Optional[Tuple[int, int]]:
+    """Conteúdo do primeiro box no caminho indicado (ex.: 'mdia', 'minf', 'stbl')"""
+    for name in path:
+        for box_type, box_start, box_end in _mp4_boxes(data, start, end):
+            if box_type == name:
+                start, end = box_start, box_end
+                break
+        else:
+            return None
+    return start, end
+
+def _mp4_time(data, offset: int, version: int) -> Tuple[int, int]:
+    """(timescale, duration) de mvhd/mdhd, a partir do conteúdo após version/flags"""
+    if version == 1:
+        _, _, timescale, duration = struct.unpack_from('>QQIQ', data, offset)
+    else:
+        _, _, timescale, duration = struct.unpack_from('>IIII', data, offset)
+    return timescale, duration
+
+def _parse_mp4_track(data, start: int, end: int, index: int) -> Optional[Dict[str, Any]]:
+    hdlr = _mp4_child(data, start, end, 'mdia', 'hdlr')
+    mdhd = _mp4_child(data, start, end, 'mdia', 'mdhd')
+    stbl = _mp4_child(data, start, end, 'mdia', 'minf', 'stbl')
+    if not hdlr or not mdhd or not stbl:
+        return None
+
+    handler = bytes(data[hdlr[0] + 8:hdlr[0] + 12]).decode('latin-1')
+    codec_type = {'vide': 'video', 'soun': 'audio'}.get(handler)
+    if codec_type is None:
+        return None
+
+    timescale, duration_units = _mp4_time(data, mdhd[0] + 4, data[mdhd[0]])
+    duration = duration_units / timescale if timescale else None
+
+    codec_name = None
+    stsd = _mp4_child(data, stbl[0], stbl[1], 'stsd')
+    if stsd and stsd[1] - stsd[0] >= 16:
+        fourcc = bytes(data[stsd[0] + 12:stsd[0] + 16]).decode('latin-1')
+        codec_name = MP4_CODECS.get(fourcc, fourcc)
+
+    nb_frames = None
+    stsz = _mp4_child(data, stbl[0], stbl[1], 'stsz')
+    if stsz:
+        nb_frames = struct.unpack_from('>I', data, stsz[0] + 8)[0]
+
+    stream: Dict[str, Any] = {
+        'index': index,
+        'codec_type': codec_type,
+        'codec_name': codec_name,
+        'duration': duration,
+        'nb_frames': nb_frames,
+    }
+    if codec_type == 'video':
+        tkhd = _mp4_child(data, start, end, 'tkhd')
+        if tkhd:
+            # largura/altura são os dois últimos campos, em ponto fixo 16.16
+            width, height = struct.unpack_from('>II', data, tkhd[1] - 8)
+            stream['width'], stream['height'] = width >> 16, height >> 16
+        stream['avg_frame_rate'] = _fraction(nb_frames, duration)
+    return stream
+
+def parse_mp4(data) -> Dict[str, Any]:
+    """Lê o moov de um MP4/M4A (esteja ele no início ou no fim do arquivo)"""
+    moov = _mp4_child(data, 0, len(data), 'moov')
+    if moov is None:
+        raise HeaderParseError("box moov não encontrado")
+
+    mvhd = _mp4_child(data, moov[0], moov[1], 'mvhd')
+    if mvhd is None:
+        raise HeaderParseError("box mvhd não encontrado")
+    timescale, duration_units = _mp4_time(data, mvhd[0] + 4, data[mvhd[0]])
+    if not timescale or not duration_units:
+        # MP4 fragmentado: a duração está espalhada pelos moof
+        raise HeaderParseError("duração ausente no mvhd (MP4 fragmentado?)")
+    duration = duration_units / timescale
+
+    streams: List[Dict[str, Any]] = []
+    for box_type, box_start, box_end in _mp4_boxes(data, moov[0], moov[1]):
+        if box_type == 'trak':
+            stream = _parse_mp4_track(data, box_start, box_end, len(streams))
+            if stream:
+                streams.append(stream)
+
+    return {'format': {'format_name': 'mov,mp4,m4a,3gp,3g2,mj2', 'duration': duration}, 'streams': streams}
+
+# ---------------------------------------------------------------------------
+# WebM / Matroska (EBML)
+# ---------------------------------------------------------------------------
+
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+CLUSTER = 0x1F43B675
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+DEFAULT_DURATION = 0x23E383
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+UNKNOWN_SIZE = -1
+
+def _ebml_vint(data, offset: int, keep_marker: bool) -> Tuple[int, int]:
+    """(valor, tamanho em bytes) de um inteiro de tamanho variável do EBML"""
+    first = data[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise HeaderParseError(f"vint inválido em {offset}")
+    value = first if keep_marker else first & (mask - 1)
+    for i in range(1, length):
+        value = (value << 8) | data[offset + i]
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        value = UNKNOWN_SIZE
+    return value, length
+
+def _ebml_elements(data, start: int, end: int) -> Iterator[Tuple[int, int, int]]:
+    """(ID, início do conteúdo, fim) dos elementos entre start e end"""
+    offset = start
+    while offset < end:
+        element_id, id_length = _ebml_vint(data, offset, keep_marker=True)
+        size, size_length = _ebml_vint(data, offset + id_length, keep_marker=False)
+        content = offset + id_length + size_length
+        element_end = end if size == UNKNOWN_SIZE else content + size
+        if element_end > end:
+            # Arquivo truncado: o que foi lido até aqui ainda vale
+            element_end = end
+        yield element_id, content, element_end
+        if size == UNKNOWN_SIZE and element_id == CLUSTER:
+            return
+        offset = element_end
+
+def _ebml_uint(data, start: int, end: int) -> int:
+    return int.from_bytes(bytes(data[start:end]), 'big')
+
+def _ebml_float(data, start: int, end: int) -> float:
+    return struct.unpack('>f' if end - start == 4 else '>d', bytes(data[start:end]))[0]
+
+def _parse_webm_track(data, start: int, end: int, index: int, duration: Optional[float]) -> Optional[Dict[str, Any]]:
+    fields: Dict[str, Any] = {}
+    for element_id, content, element_end in _ebml_elements(data, start, end):
+        if element_id == TRACK_TYPE:
+            fields['type'] = _ebml_uint(data, content, element_end)
+        elif element_id == CODEC_ID:
+            fields['codec'] = bytes(data[content:element_end]).decode('ascii', 'replace').rstrip('\x00')
+        elif element_id == DEFAULT_DURATION:
+            fields['frame_ns'] = _ebml_uint(data, content, element_end)
+        elif element_id == VIDEO:
+            for video_id, video_start, video_end in _ebml_elements(data, content, element_end):
+                if video_id == PIXEL_WIDTH:
+                    fields['width'] = _ebml_uint(data, video_start, video_end)
+                elif video_id == PIXEL_HEIGHT:
+                    fields['height'] = _ebml_uint(data, video_start, video_end)
+
+    codec_type = {1: 'video', 2: 'audio'}.get(fields.get('type'))
+    if codec_type is None:
+        return None
+    codec = fields.get('codec')
+    stream: Dict[str, Any] = {
+        'index': index,
+        'codec_type': codec_type,
+        'codec_name': WEBM_CODECS.get(codec, codec.lower() if codec else None),
+    }
+    if codec_type == 'video':
+        stream['width'] = fields.get('width')
+        stream['height'] = fields.get('height')
+        frame_ns = fields.get('frame_ns')
+        if not frame_ns:
+            # Sem DefaultDuration não há como contar frames sem ler os Clusters
+            raise HeaderParseError("faixa de vídeo sem DefaultDuration")
+        stream['avg_frame_rate'] = _fraction(1e9, frame_ns)
+        if duration:
+            stream['nb_frames'] = int(round(duration * 1e9 / frame_ns))
+    return stream
+
+def parse_webm(data) -> Dict[str, Any]:
+    """Lê Info e Tracks do cabeçalho EBML (os Clusters com a mídia são pulados)"""
+    elements = _ebml_elements(data, 0, len(data))
+    first = next(elements, None)
+    if first is None or first[0] != EBML_HEADER:
+        raise HeaderParseError("cabeçalho EBML não encontrado")
+    segment = next((e for e in elements if e[0] == SEGMENT), None)
+    if segment is None:
+        raise HeaderParseError("Segment não encontrado")
+
+    timecode_scale = 1_000_000
+    duration = None
+    tracks = None
+    for element_id, content, element_end in _ebml_elements(data, segment[1], segment[2]):
+        if element_id == INFO:
+            for info_id, info_start, info_end in _ebml_elements(data, content, element_end):
+                if info_id == TIMECODE_SCALE:
+                    timecode_scale = _ebml_uint(data, info_start, info_end)
+                elif info_id == DURATION:
+                    duration = _ebml_float(data, info_start, info_end)
+        elif element_id == TRACKS:
+            tracks = (content, element_end)
+        elif element_id == CLUSTER and tracks is not None:
+            break
+
+    if duration is None or tracks is None:
+        # Sem Duration (ex.: gravação ao vivo) a resposta precisaria varrer os Clusters
+        raise HeaderParseError("Duration ou Tracks ausentes no cabeçalho")
+    duration_seconds = duration * timecode_scale / 1e9
+
+    streams: List[Dict[str, Any]] = []
+    for element_id, content, element_end in _ebml_elements(data, tracks[0], tracks[1]):
+        if element_id == TRACK_ENTRY:
+            stream = _parse_webm_track(data, content, element_end, len(streams), duration_seconds)
+            if stream:
+                streams.append(stream)
+
+    return {'format': {'format_name': 'matroska,webm', 'duration': duration_seconds}, 'streams': streams}
+
+# ---------------------------------------------------------------------------
+
+def supports(path: str) -> bool:
+    return path.lower().endswith(MP4_EXTENSIONS + WEBM_EXTENSIONS)
+
+def parse_header(path: str) -> Dict[str, Any]:
+    """
+    Lê o cabeçalho do arquivo via mmap e devolve um dict no formato do JSON
+    do ffprobe. Levanta HeaderParseError se o container não for suportado
+    ou o cabeçalho não tiver as informações necessárias.
+    """
+    if not supports(path):
+        raise HeaderParseError(f"container não suportado: {os.path.basename(path)}")
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            raise HeaderParseError("arquivo vazio")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                if path.lower().endswith(MP4_EXTENSIONS):
+                    result = parse_mp4(data)
+                else:
+                    result = parse_webm(data)
+            except (struct.error, IndexError, ValueError) as e:
+                raise HeaderParseError(f"cabeçalho corrompido: {e}") from e
+
+    result['format']['size'] = size
+    duration = result['format']['duration']
+    result['format']['bit_rate'] = int(size * 8 / duration) if duration else None
+    return result
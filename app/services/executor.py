@@ -0,0 +1,58 @@
+"""
+Camada de execução para trabalho bloqueante.
+
+As rotas são `async def`, então qualquer chamada síncrona ao yt-dlp, ffmpeg ou
+subprocess congela o event loop do uvicorn. Este módulo mantém executores
+dedicados e limitados para que essas chamadas rodem fora do loop.
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from ..utils.config import DOWNLOAD_WORKERS, IO_WORKERS, INFO_HEDGE_MAX_PARALLEL
+
+logger = logging.getLogger(__name__)
+
+# Nome do pool -> número máximo de threads
+POOL_SIZES = {
+    'download': DOWNLOAD_WORKERS,
+    'io': IO_WORKERS,
+    # Tentativas paralelas do modo hedged; separado do 'io' porque quem
+    # dispara as tentativas já está rodando em uma thread do 'io'
+    'hedge': IO_WORKERS * INFO_HEDGE_MAX_PARALLEL,
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+def get_executor(pool: str = 'io') -> ThreadPoolExecutor:
+    """Retorna (criando se necessário) o executor dedicado do pool informado"""
+    if pool not in POOL_SIZES:
+        raise ValueError(f"Pool de execução desconhecido: {pool}")
+
+    with _executors_lock:
+        executor = _executors.get(pool)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=max(1, POOL_SIZES[pool]),
+                thread_name_prefix=f"{pool}-worker"
+            )
+            _executors[pool] = executor
+            logger.info(f"🧵 Executor '{pool}' criado com {POOL_SIZES[pool]} workers")
+        return executor
+
+async def run_blocking(func: Callable[..., Any], *args, pool: str = 'io', **kwargs) -> Any:
+    """Executa uma função bloqueante no executor dedicado sem travar o event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(func, *args, **kwargs))
+
+def shutdown_executors(wait: bool = False) -> None:
+    """Encerra todos os executores (chamado no shutdown da aplicação)"""
+    with _executors_lock:
+        for name, executor in _executors.items():
+            logger.info(f"🧵 Encerrando executor '{name}'")
+            executor.shutdown(wait=wait, cancel_futures=True)
+        _executors.clear()
@@ -0,0 +1,215 @@
+"""
+Execução do ffmpeg com progresso.
+
+O ffmpeg roda via asyncio.create_subprocess_exec com -progress pipe:1: o
+stdout traz blocos chave=valor (out_time_us, speed, progress=continue/end)
+que viram eventos de progresso com percentual e velocidade. O timeout é
+proporcional à duração do vídeo, em vez dos 300s fixos de antes. Com
+-benchmark o ffmpeg informa no stderr o tempo de CPU (utime + stime) gasto.
+A entrada pode vir de um iterador de bytes escrito no stdin (-i pipe:0).
+"""
+import asyncio
+import logging
+import re
+import threading
+import time
+from typing import Callable, Iterator, List, Optional
+
+from ..utils.config import FFMPEG_TIMEOUT_BASE, FFMPEG_TIMEOUT_PER_SECOND, FFMPEG_TIMEOUT_DEFAULT
+from ..utils.ffmpeg_locator import get_ffmpeg_path
+
+logger = logging.getLogger(__name__)
+
+# Recebe (percentual ou None, velocidade como '2.5x' ou None)
+ProgressCallback = Callable[[Optional[float], Optional[str]], None]
+
+# Quanto do stderr guardar para diagnóstico
+STDERR_TAIL_BYTES = 16 * 1024
+
+# Entrada pelo stdin: chunks lidos à frente do que o ffmpeg já consumiu, intervalo
+# em que a thread de leitura confere o pedido de parada e espera pelo fim da
+# escrita depois que o ffmpeg sai
+STDIN_MAX_PENDING = 16
+STDIN_STOP_POLL_SECONDS = 0.5
+STDIN_GRACE_SECONDS = 5.0
+
+# Linha final do -benchmark: 'bench: utime=1.234s stime=0.056s rtime=0.789s'
+BENCH_PATTERN = re.compile(r'bench: utime=([\d.]+)s stime=([\d.]+)s')
+
+class FfmpegResult:
+    """Resultado de uma execução do ffmpeg"""
+
+    def __init__(self, returncode: Optional[int], stderr: str, elapsed: float, timed_out: bool = False,
+                 input_error: Optional[str] = None):
+        self.returncode = returncode
+        self.stderr = stderr
+        self.elapsed = elapsed
+        self.timed_out = timed_out
+        self.input_error = input_error  # falha ao produzir os bytes do stdin (ex.: download interrompido)
+
+    @property
+    def cpu_seconds(self) -> Optional[float]:
+        """Tempo de CPU (usuário + sistema) do ffmpeg, lido da linha do -benchmark"""
+        match = BENCH_PATTERN.search(self.stderr)
+        return float(match.group(1)) + float(match.group(2)) if match else None
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and self.input_error is None
+
+def conversion_timeout(duration: Optional[float], factor: float = 1.0) -> float:
+    """Timeout em segundos proporcional à duração da mídia (factor > 1 para recodificação)"""
+    if not duration or duration <= 0:
+        return FFMPEG_TIMEOUT_DEFAULT * factor
+    return FFMPEG_TIMEOUT_BASE + duration * FFMPEG_TIMEOUT_PER_SECOND * factor
+
+async def _read_progress(stream: asyncio.StreamReader, duration: Optional[float],
+                         on_progress: Optional[ProgressCallback]) -> None:
+    """Lê os blocos de -progress e chama on_progress ao fim de cada bloco"""
+    out_time = None
+    speed = None
+    while True:
+        line = await stream.readline()
+        if not line:
+            return
+        key, _, value = line.decode('utf-8', 'replace').strip().partition('=')
+        if key == 'out_time_us' and value.isdigit():
+            out_time = int(value) / 1_000_000
+        elif key == 'speed':
+            speed = value.strip() if value.strip() not in ('', 'N/A') else None
+        elif key == 'progress' and on_progress:
+            if value == 'end':
+                percent = 100.0
+            elif duration and out_time is not None:
+                percent = min(99.9, out_time / duration * 100)
+            else:
+                percent = None
+            try:
+                on_progress(percent, speed)
+            except Exception as e:
+                logger.warning(f"Erro no callback de progresso do ffmpeg: {e}")
+
+async def _read_tail(stream: asyncio.StreamReader, limit: int) -> bytes:
+    """Consome o stderr inteiro (evita travar o pipe) guardando só o final"""
+    tail = b''
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            return tail
+        tail = (tail + chunk)[-limit:]
+
+def _pump_chunks(chunks: Iterator[bytes], loop: asyncio.AbstractEventLoop, queue: "asyncio.Queue",
+                 slots: threading.Semaphore, stop: threading.Event) -> None:
+    """
+    Thread dedicada que consome o iterador bloqueante e entrega os chunks ao
+    event loop (no máximo STDIN_MAX_PENDING à frente do ffmpeg). Ao receber
+    stop ela para no próximo chunk e fecha o iterador (e a resposta HTTP).
+    """
+    def post(item) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+            return True
+        except RuntimeError:
+            return False  # event loop já encerrado
+
+    end = None
+    try:
+        for chunk in chunks:
+            while not slots.acquire(timeout=STDIN_STOP_POLL_SECONDS):
+                if stop.is_set():
+                    return
+            if stop.is_set() or not post(chunk):
+                return
+    except Exception as e:
+        end = e
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+    if not stop.is_set():
+        post(end)
+
+async def _feed_stdin(stdin: asyncio.StreamWriter, chunks: Iterator[bytes]) -> Optional[str]:
+    """Escreve os chunks no stdin do ffmpeg; o iterador (bloqueante) é consumido numa thread própria"""
+    queue: "asyncio.Queue" = asyncio.Queue()
+    slots = threading.Semaphore(STDIN_MAX_PENDING)
+    stop = threading.Event()
+    # Thread daemon fora do executor padrão: uma leitura travada não segura o encerramento do asyncio.run
+    threading.Thread(target=_pump_chunks, args=(chunks, asyncio.get_running_loop(), queue, slots, stop),
+                     name='ffmpeg-stdin', daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return None
+            if isinstance(item, Exception):
+                raise item
+            slots.release()
+            stdin.write(item)
+            await stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # O ffmpeg fechou a entrada: o erro dele aparece no returncode/stderr
+        return None
+    except Exception as e:
+        logger.error(f"❌ Erro ao alimentar o stdin do ffmpeg: {e}")
+        return str(e) or e.__class__.__name__
+    finally:
+        stop.set()
+        try:
+            stdin.close()
+        except Exception:
+            pass
+
+async def run_ffmpeg_async(args: List[str], duration: Optional[float] = None,
+                           on_progress: Optional[ProgressCallback] = None,
+                           timeout: Optional[float] = None,
+                           stdin_chunks: Optional[Iterator[bytes]] = None) -> FfmpegResult:
+    """Executa ffmpeg com args (sem o executável) reportando progresso; stdin_chunks alimenta pipe:0"""
+    timeout = timeout or conversion_timeout(duration)
+    cmd = [get_ffmpeg_path(), '-hide_banner', '-nostats', '-benchmark', '-progress', 'pipe:1', *args]
+    logger.info(f"Executando: {' '.join(cmd)} (timeout {timeout:.0f}s)")
+
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin_chunks is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    progress_task = asyncio.ensure_future(_read_progress(process.stdout, duration, on_progress))
+    stderr_task = asyncio.ensure_future(_read_tail(process.stderr, STDERR_TAIL_BYTES))
+    feed_task = asyncio.ensure_future(_feed_stdin(process.stdin, stdin_chunks)) if stdin_chunks is not None else None
+
+    timed_out = False
+    try:
+        await asyncio.wait_for(process.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        logger.error(f"⏰ ffmpeg excedeu o timeout de {timeout:.0f}s, encerrando processo")
+        process.kill()
+        await process.wait()
+
+    input_error = None
+    if feed_task is not None:
+        if not timed_out:
+            # O ffmpeg pode sair sem ler a entrada toda enquanto uma leitura do iterador está travada
+            await asyncio.wait({feed_task}, timeout=STDIN_GRACE_SECONDS)
+        if feed_task.done():
+            input_error = feed_task.result()
+        else:
+            feed_task.cancel()
+            await asyncio.wait({feed_task})
+
+    await progress_task
+    stderr = (await stderr_task).decode('utf-8', 'replace')
+    return FfmpegResult(process.returncode, stderr, time.perf_counter() - start, timed_out, input_error)
+
+def run_ffmpeg(args: List[str], duration: Optional[float] = None,
+               on_progress: Optional[ProgressCallback] = None,
+               timeout: Optional[float] = None,
+               stdin_chunks: Optional[Iterator[bytes]] = None) -> FfmpegResult:
+    """Versão síncrona para os workers de download (cada chamada tem seu próprio event loop)"""
+    return asyncio.run(run_ffmpeg_async(args, duration, on_progress, timeout, stdin_chunks))
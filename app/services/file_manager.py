@@ -1,23 +1,69 @@
 import os
+import shutil
+import tempfile
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Optional
 from fastapi import HTTPException
 
-from ..utils.config import DOWNLOAD_DIR
+from ..utils.config import DOWNLOAD_DIR, JOBS_DIR, DISK_SPACE_FACTOR, DISK_SPACE_RESERVE
 from ..utils.helpers import sanitize_filename
-from ..services.video_converter import find_and_convert_latest_video
+from .video_errors import TerminalJobError
+from .media_probe import probe_file
 
 logger = logging.getLogger(__name__)
 
-def find_downloaded_file(title: str) -> Optional[str]:
-    """Encontra o arquivo baixado mais recente e garante que está em MP4"""
-    try:
-        # Usar a nova função de conversão que encontra e converte automaticamente
-        final_filename = find_and_convert_latest_video()
-        return final_filename
-    except Exception as e:
-        logger.warning(f"Erro ao encontrar arquivo: {e}")
-        return None
+# Extensões que a listagem passa pelo probe (arquivos parciais e não-mídia são listados sem probe)
+MEDIA_EXTENSIONS = ('.mp4', '.webm', '.mkv', '.m4a', '.mp3', '.opus', '.ogg')
+
+def create_job_dir(video_id: Optional[str] = None) -> str:
+    """Cria um diretório de trabalho exclusivo para um job de download"""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    prefix = f"{sanitize_filename(video_id)}_" if video_id else "job_"
+    return tempfile.mkdtemp(prefix=prefix, dir=JOBS_DIR)
+
+def cleanup_job_dir(job_dir: str) -> None:
+    """Remove o diretório de trabalho do job e tudo o que sobrou nele"""
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+def ensure_disk_space(estimated_bytes: int) -> None:
+    """
+    Recusa o job antes de escrever qualquer byte se não houver espaço em disco.
+
+    O download e a cópia convertida coexistem no diretório do job, por isso
+    a estimativa é multiplicada por DISK_SPACE_FACTOR, mais uma reserva fixa.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    free = shutil.disk_usage(JOBS_DIR).free
+    required = int(estimated_bytes * DISK_SPACE_FACTOR) + DISK_SPACE_RESERVE
+    if free < required:
+        logger.warning(f"💾 Espaço insuficiente: {free / (1024 * 1024):.0f}MB livres, {required / (1024 * 1024):.0f}MB necessários")
+        raise TerminalJobError(
+            'insufficient_storage', 507,
+            f"Espaço em disco insuficiente para este download (~{estimated_bytes / (1024 * 1024):.0f}MB). Tente uma qualidade menor."
+        )
+
+def move_into_library(source_path: str, name_factory: Callable[[], str]) -> str:
+    """
+    Move atomicamente o arquivo final do job para o DOWNLOAD_DIR.
+
+    O nome é reservado com O_EXCL antes do os.replace, então dois jobs
+    concorrentes nunca recebem o mesmo nome nem sobrescrevem um ao outro.
+    """
+    while True:
+        filename = name_factory()
+        target_path = os.path.join(DOWNLOAD_DIR, filename)
+        try:
+            fd = os.open(target_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        os.close(fd)
+        try:
+            os.replace(source_path, target_path)
+        except Exception:
+            os.remove(target_path)
+            raise
+        logger.info(f"📦 Arquivo movido para a biblioteca: {filename}")
+        return filename
 
 def list_all_downloads() -> Dict[str, Any]:
     """Lista todos os arquivos baixados"""
@@ -27,10 +73,15 @@ def list_all_downloads() -> Dict[str, Any]:
             file_path = os.path.join(DOWNLOAD_DIR, filename)
             if os.path.isfile(file_path):
                 file_stat = os.stat(file_path)
+                # Probe em cache por (caminho, tamanho, mtime), falhas inclusive: só roda de novo se o arquivo mudar
+                probe = probe_file(file_path) if filename.lower().endswith(MEDIA_EXTENSIONS) else None
+                video = probe.video if probe else None
                 files.append({
                     "filename": filename,
                     "size_mb": round(file_stat.st_size / (1024 * 1024), 2),
-                    "created_at": file_stat.st_ctime
+                    "created_at": file_stat.st_ctime,
+                    "duration": probe.duration if probe else None,
+                    "resolution": f"{video.width}x{video.height}" if video and video.width else None,
                 })
 
         return {"downloads": files, "total": len(files)}
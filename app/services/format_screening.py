@@ -0,0 +1,109 @@
+"""
+Triagem dos formatos antes do download.
+
+Alguns player clients só devolvem storyboards (miniaturas em MHTML/JPEG) ou
+formatos sem mídia utilizável. Antes, isso só era percebido depois do
+download, pelo tamanho do arquivo ou pelo ffprobe. Aqui os formatos são
+verificados pelos metadados da extração: storyboards, protocolos de imagem,
+formatos sem vídeo nem áudio e bitrates implausíveis são descartados, e a
+estratégia que só oferece lixo é pulada sem transferir nenhum byte.
+"""
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.config import FORMAT_MIN_VIDEO_TBR, FORMAT_MIN_AUDIO_TBR, FORMAT_MAX_TBR
+
+logger = logging.getLogger(__name__)
+
+# IDs de storyboard do YouTube: sb0, sb1, sb2...
+STORYBOARD_ID = re.compile(r'^sb\d*$', re.IGNORECASE)
+
+# Protocolos e extensões que só entregam imagens
+IMAGE_PROTOCOLS = ('mhtml',)
+IMAGE_EXTENSIONS = ('mhtml', 'jpg', 'jpeg', 'png', 'webp')
+
+def _has_codec(value: Optional[str]) -> bool:
+    # None significa "desconhecido" (ex.: extrator genérico), não "ausente"
+    return value != 'none'
+
+def rejection_reason(fmt: Dict[str, Any]) -> Optional[str]:
+    """Motivo para descartar o formato, ou None se ele parece utilizável"""
+    format_id = str(fmt.get('format_id') or '')
+    if STORYBOARD_ID.match(format_id) or 'storyboard' in format_id.lower() \
+            or 'storyboard' in str(fmt.get('format_note') or '').lower():
+        return 'storyboard'
+
+    if fmt.get('protocol') in IMAGE_PROTOCOLS or fmt.get('ext') in IMAGE_EXTENSIONS:
+        return 'image_protocol'
+
+    has_video = _has_codec(fmt.get('vcodec'))
+    has_audio = _has_codec(fmt.get('acodec'))
+    if not has_video and not has_audio:
+        return 'no_media'
+
+    tbr = fmt.get('tbr')
+    if tbr:
+        minimum = FORMAT_MIN_VIDEO_TBR if has_video and fmt.get('vcodec') else FORMAT_MIN_AUDIO_TBR
+        if tbr < minimum or tbr > FORMAT_MAX_TBR:
+            return 'implausible_bitrate'
+    return None
+
+class FormatRejectionStats:
+    """Contadores de formatos descartados por motivo, e de estratégias puladas"""
+
+    def __init__(self):
+        self._reasons: Counter = Counter()
+        self._skipped_strategies: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, reasons: Counter) -> None:
+        with self._lock:
+            self._reasons.update(reasons)
+
+    def record_skip(self, strategy_name: str) -> None:
+        with self._lock:
+            self._skipped_strategies[strategy_name] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'rejected_formats': dict(self._reasons),
+                'skipped_strategies': dict(self._skipped_strategies),
+            }
+
+format_rejections = FormatRejectionStats()
+
+def screen_formats(info: Dict[str, Any], audio_only: bool) -> Tuple[List[Dict[str, Any]], Counter]:
+    """
+    Remove de info['formats'] os formatos inúteis.
+
+    Retorna (formatos que atendem à requisição, contagem de motivos de
+    rejeição). Para vídeo, só contam formatos com vídeo; para áudio, formatos
+    com áudio. Uma lista vazia significa que a estratégia deve ser pulada.
+    """
+    # Extratores sem lista de formatos (arquivo único) descrevem o formato no próprio info
+    formats = info.get('formats')
+    candidates = formats if formats is not None else [info]
+
+    kept: List[Dict[str, Any]] = []
+    reasons: Counter = Counter()
+    for fmt in candidates:
+        reason = rejection_reason(fmt)
+        if reason:
+            reasons[reason] += 1
+            logger.debug(f"🧹 Formato {fmt.get('format_id')} descartado: {reason}")
+            continue
+        kept.append(fmt)
+
+    if reasons:
+        logger.info(f"🧹 Formatos descartados antes do download: {dict(reasons)}")
+        format_rejections.record(reasons)
+    if formats is not None:
+        info['formats'] = kept
+
+    codec_field = 'acodec' if audio_only else 'vcodec'
+    usable = [fmt for fmt in kept if _has_codec(fmt.get(codec_field))]
+    return usable, reasons
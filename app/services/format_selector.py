@@ -0,0 +1,217 @@
+"""
+Motor de seleção de formatos.
+
+Converte VideoRequest.quality (360p/480p/720p/1080p/best) e
+VideoRequest.format em expressões de formato do yt-dlp. Dá preferência a
+formatos que chegam no container pedido (merge por cópia de streams, sem
+recodificar) e nunca baixa uma resolução maior que a solicitada.
+
+Quando a requisição traz orçamento (max_bytes / max_seconds), o tamanho de
+cada formato é estimado por filesize, filesize_approx ou tbr × duração, e é
+escolhida a melhor qualidade que cabe no orçamento.
+"""
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models.schemas import VideoRequest
+from ..utils.config import AUDIO_OUTPUT_MODE
+from .video_errors import TerminalJobError
+
+logger = logging.getLogger(__name__)
+
+# Containers de vídeo suportados e o áudio que combina com cada um sem recodificar
+VIDEO_CONTAINERS = {
+    'mp4': 'm4a',
+    'webm': 'webm',
+    'mkv': None,  # MKV aceita qualquer par de codecs
+}
+
+# Valores de VideoRequest.format que significam "apenas áudio" (a GUI envia 'audio')
+AUDIO_FORMATS = ('audio', 'mp3', 'm4a', 'opus', 'ogg')
+
+# Containers de áudio que podem ser pedidos explicitamente; 'audio' = passthrough do
+# melhor áudio nativo (o container final depende do codec baixado)
+AUDIO_CONTAINERS = ('mp3', 'm4a', 'opus', 'ogg')
+
+# Expressão de formato por container de áudio
+AUDIO_FORMAT_EXPRESSIONS = {
+    'mp3': 'ba[ext=m4a]/ba/b',  # será recodificado de qualquer forma
+    'm4a': 'ba[ext=m4a]/ba/b',
+    'opus': 'ba[acodec=opus]/ba/b',
+    'ogg': 'ba[acodec=opus]/ba[acodec=vorbis]/ba/b',
+    'audio': 'ba/b',
+}
+
+def normalize_quality(quality: Optional[str]) -> str:
+    """'720', '720p', '720P' -> '720p'; qualquer outra coisa -> 'best'"""
+    match = re.fullmatch(r'\s*(\d{3,4})\s*[pP]?\s*', quality or '')
+    return f"{int(match.group(1))}p" if match else 'best'
+
+def max_height(quality: Optional[str]) -> Optional[int]:
+    """Altura máxima em pixels para a qualidade pedida (None = sem limite)"""
+    normalized = normalize_quality(quality)
+    return None if normalized == 'best' else int(normalized[:-1])
+
+def is_audio_request(request: VideoRequest) -> bool:
+    return bool(request.audio_only) or (request.format or '').lower() in AUDIO_FORMATS
+
+def accepted_containers(request: VideoRequest) -> Tuple[str, ...]:
+    """Containers aceitos pelo cliente, normalizados ('.WebM' -> 'webm', 'matroska' -> 'mkv')"""
+    aliases = {'matroska': 'mkv'}
+    containers = {(value or '').strip().lower().lstrip('.') for value in request.accept_containers or []}
+    return tuple(sorted(aliases.get(value, value) for value in containers if value))
+
+def resolve_container(request: VideoRequest) -> str:
+    """
+    Container final pedido pelo cliente ('video' e valores desconhecidos viram mp4).
+
+    Áudio sem container explícito vira 'audio' (passthrough do áudio nativo)
+    ou 'mp3', conforme AUDIO_OUTPUT_MODE.
+    """
+    requested = (request.format or 'mp4').lower()
+    if is_audio_request(request):
+        if requested in AUDIO_CONTAINERS:
+            return requested
+        return 'mp3' if AUDIO_OUTPUT_MODE == 'mp3' else 'audio'
+    return requested if requested in VIDEO_CONTAINERS else 'mp4'
+
+def build_format_expression(request: VideoRequest) -> str:
+    """Expressão de formato do yt-dlp para a requisição"""
+    if is_audio_request(request):
+        return AUDIO_FORMAT_EXPRESSIONS[resolve_container(request)]
+
+    height = max_height(request.quality)
+    limit = f"[height<={height}]" if height else ""
+    container = resolve_container(request)
+    audio_ext = VIDEO_CONTAINERS.get(container)
+
+    candidates = []
+    if container != 'mkv':
+        # 1) vídeo + áudio já no container pedido: merge por cópia de streams
+        audio_filter = f"[ext={audio_ext}]" if audio_ext else ""
+        candidates.append(f"bv*{limit}[ext={container}]+ba{audio_filter}")
+        # 2) arquivo progressivo no container pedido: nenhum pós-processamento
+        candidates.append(f"b{limit}[ext={container}]")
+    # 3) qualquer par dentro do limite de resolução, 4) qualquer progressivo dentro do limite
+    candidates.append(f"bv*{limit}+ba")
+    candidates.append(f"b{limit}")
+    if limit:
+        # 5) último recurso: o que houver (ex.: o client só oferece resoluções maiores)
+        candidates.append("b")
+    return '/'.join(candidates)
+
+def build_format_options(request: VideoRequest) -> Dict[str, Any]:
+    """Opções do yt-dlp relativas a formato, aplicadas a todas as estratégias"""
+    options: Dict[str, Any] = {'format': build_format_expression(request)}
+    if not is_audio_request(request):
+        container = resolve_container(request)
+        options['merge_output_format'] = container
+        # Desempate: resolução mais próxima da pedida, depois o container pedido
+        height = max_height(request.quality)
+        sort = [f"res:{height}"] if height else []
+        if container != 'mkv':
+            sort.append(f"ext:{container}:{VIDEO_CONTAINERS[container]}")
+        options['format_sort'] = sort
+    return options
+
+def describe_selection(info: Dict[str, Any]) -> Dict[str, Any]:
+    """Resumo do formato escolhido pelo yt-dlp (itags, resolução, container)"""
+    requested = info.get('requested_formats') or [info]
+    return {
+        'format_id': info.get('format_id'),
+        'itags': [f.get('format_id') for f in requested],
+        'height': info.get('height'),
+        'ext': info.get('ext'),
+        'vcodec': info.get('vcodec'),
+        'acodec': info.get('acodec'),
+    }
+
+def estimate_format_size(fmt: Dict[str, Any], duration: Optional[float]) -> Optional[int]:
+    """Tamanho estimado em bytes: filesize, filesize_approx ou tbr (kbit/s) × duração"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 1000 / 8 * duration)
+    return None
+
+def estimate_selection_size(info: Dict[str, Any]) -> Optional[int]:
+    """Tamanho estimado do formato escolhido pelo yt-dlp (soma vídeo + áudio num merge)"""
+    duration = info.get('duration')
+    sizes = [estimate_format_size(f, duration) for f in info.get('requested_formats') or [info]]
+    if not sizes or None in sizes:
+        return None
+    return sum(sizes)
+
+def budget_bytes(request: VideoRequest, throughput: float) -> Optional[int]:
+    """Limite de bytes do job: max_bytes e/ou o que dá para baixar em max_seconds"""
+    limits = []
+    if request.max_bytes:
+        limits.append(int(request.max_bytes))
+    if request.max_seconds:
+        limits.append(int(request.max_seconds * throughput))
+    return min(limits) if limits else None
+
+def _budget_candidates(info: Dict[str, Any], request: VideoRequest) -> List[Tuple[str, Optional[int]]]:
+    """(especificação, tamanho estimado) das combinações possíveis, da melhor para a pior"""
+    duration = info.get('duration')
+    formats = info.get('formats') or []
+    audio_only = [f for f in formats if f.get('vcodec') == 'none' and f.get('acodec') not in (None, 'none')]
+
+    if is_audio_request(request):
+        # m4a primeiro (mesma preferência de build_format_expression), depois bitrate
+        audio_only.sort(key=lambda f: (f.get('ext') == 'm4a', f.get('abr') or f.get('tbr') or 0), reverse=True)
+        return [(f['format_id'], estimate_format_size(f, duration)) for f in audio_only]
+
+    height = max_height(request.quality)
+    container = resolve_container(request)
+    audio_ext = VIDEO_CONTAINERS.get(container)
+    videos = [
+        f for f in formats
+        if f.get('vcodec') not in (None, 'none') and (not height or (f.get('height') or 0) <= height)
+    ]
+    videos.sort(key=lambda f: (f.get('height') or 0, f.get('ext') == container, f.get('tbr') or 0), reverse=True)
+    audio_only.sort(key=lambda f: (audio_ext is None or f.get('ext') == audio_ext, f.get('abr') or f.get('tbr') or 0), reverse=True)
+
+    candidates = []
+    for video in videos:
+        video_size = estimate_format_size(video, duration)
+        if video.get('acodec') not in (None, 'none'):
+            candidates.append((video['format_id'], video_size))
+            continue
+        for audio in audio_only:
+            audio_size = estimate_format_size(audio, duration)
+            total = video_size + audio_size if video_size is not None and audio_size is not None else None
+            candidates.append((f"{video['format_id']}+{audio['format_id']}", total))
+    return candidates
+
+def select_within_budget(info: Dict[str, Any], request: VideoRequest, throughput: float) -> Optional[Tuple[str, int]]:
+    """
+    Melhor combinação de formatos que cabe no orçamento da requisição.
+
+    Retorna (especificação para o yt-dlp, tamanho estimado), ou None quando
+    não há orçamento ou nenhum formato tem tamanho estimável. Levanta
+    TerminalJobError quando nada cabe: nenhuma estratégia vai mudar isso.
+    """
+    limit = budget_bytes(request, throughput)
+    if limit is None:
+        return None
+
+    candidates = _budget_candidates(info, request)
+    sized = [(spec, size) for spec, size in candidates if size is not None]
+    if not sized:
+        logger.warning("⚠️ Nenhum formato com tamanho estimável, orçamento não pode ser aplicado")
+        return None
+
+    for spec, size in sized:
+        if size <= limit:
+            logger.info(f"💰 Orçamento de {limit / (1024 * 1024):.1f}MB: formato {spec} (~{size / (1024 * 1024):.1f}MB)")
+            return spec, size
+
+    smallest = min(size for _, size in sized)
+    raise TerminalJobError(
+        'budget_exceeded', 413,
+        f"Nenhum formato cabe no orçamento de {limit / (1024 * 1024):.1f}MB "
+        f"(menor opção: ~{smallest / (1024 * 1024):.1f}MB)"
+    )
@@ -0,0 +1,174 @@
+"""
+Serviço de probe de mídia.
+
+Um único probe por arquivo, com resultado tipado (streams, duração, frames,
+bitrate) e cache por (caminho, tamanho, mtime): o processamento do download,
+os validadores e a listagem de /downloads reaproveitam o mesmo resultado
+enquanto o arquivo não muda. MP4/M4A/WebM são lidos pelo parser de
+cabeçalhos em Python puro; o ffprobe fica para os demais containers.
+"""
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..utils.config import PROBE_CACHE_SIZE
+from ..utils.ffmpeg_locator import get_ffprobe_path
+from .container_parser import HeaderParseError, parse_header, supports
+
+logger = logging.getLogger(__name__)
+
+PROBE_ENTRIES = (
+    'stream=index,codec_type,codec_name,width,height,duration,nb_frames,avg_frame_rate,bit_rate'
+    ':format=format_name,duration,size,bit_rate'
+)
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+def _frame_rate(value: Optional[str]) -> Optional[float]:
+    """'30000/1001' -> 29.97"""
+    if not value or '/' not in value:
+        return _to_float(value)
+    num, den = value.split('/', 1)
+    num, den = _to_float(num), _to_float(den)
+    return num / den if num and den else None
+
+class ProbeStream:
+    """Um stream do arquivo (vídeo, áudio, legenda...)"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.index: int = data.get('index', 0)
+        self.codec_type: Optional[str] = data.get('codec_type')
+        self.codec_name: Optional[str] = data.get('codec_name')
+        self.width: Optional[int] = _to_int(data.get('width'))
+        self.height: Optional[int] = _to_int(data.get('height'))
+        self.duration: Optional[float] = _to_float(data.get('duration'))
+        self.nb_frames: Optional[int] = _to_int(data.get('nb_frames'))
+        self.frame_rate: Optional[float] = _frame_rate(data.get('avg_frame_rate'))
+        self.bit_rate: Optional[int] = _to_int(data.get('bit_rate'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+class ProbeResult:
+    """Resultado tipado do ffprobe para um arquivo"""
+
+    def __init__(self, path: str, data: Dict[str, Any], source: str = 'ffprobe'):
+        fmt = data.get('format') or {}
+        self.path = path
+        self.source = source  # 'header' (parser em Python) ou 'ffprobe'
+        self.streams: List[ProbeStream] = [ProbeStream(s) for s in data.get('streams') or []]
+        self.format_name: Optional[str] = fmt.get('format_name')
+        self.duration: Optional[float] = _to_float(fmt.get('duration'))
+        self.size: Optional[int] = _to_int(fmt.get('size'))
+        self.bit_rate: Optional[int] = _to_int(fmt.get('bit_rate'))
+
+    @property
+    def video(self) -> Optional[ProbeStream]:
+        return next((s for s in self.streams if s.codec_type == 'video'), None)
+
+    @property
+    def audio(self) -> Optional[ProbeStream]:
+        return next((s for s in self.streams if s.codec_type == 'audio'), None)
+
+    @property
+    def video_frames(self) -> Optional[int]:
+        """Frames do primeiro stream de vídeo (estimado por fps × duração se o container não informa)"""
+        video = self.video
+        if video is None:
+            return None
+        if video.nb_frames:
+            return video.nb_frames
+        duration = video.duration or self.duration
+        if video.frame_rate and duration:
+            return int(video.frame_rate * duration)
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'source': self.source,
+            'format_name': self.format_name,
+            'duration': self.duration,
+            'size': self.size,
+            'bit_rate': self.bit_rate,
+            'video_frames': self.video_frames,
+            'streams': [s.to_dict() for s in self.streams],
+        }
+
+def _run_ffprobe(path: str) -> Optional[ProbeResult]:
+    cmd = [get_ffprobe_path(), '-v', 'error', '-show_entries', PROBE_ENTRIES, '-of', 'json', path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+    except Exception as e:
+        logger.error(f"❌ Erro ao executar ffprobe: {e}")
+        return None
+    if result.returncode != 0:
+        logger.error(f"❌ Erro ao diagnosticar arquivo: {result.stderr.strip()}")
+        return None
+    try:
+        return ProbeResult(path, json.loads(result.stdout))
+    except ValueError as e:
+        logger.error(f"❌ Saída inválida do ffprobe: {e}")
+        return None
+
+def _probe_uncached(path: str) -> Optional[ProbeResult]:
+    """Parser de cabeçalho quando o container permite, senão ffprobe"""
+    if supports(path):
+        try:
+            return ProbeResult(path, parse_header(path), source='header')
+        except HeaderParseError as e:
+            logger.debug(f"Cabeçalho de {os.path.basename(path)} não lido ({e}), usando ffprobe")
+    return _run_ffprobe(path)
+
+class ProbeCache:
+    """Cache LRU de probes por (caminho, tamanho, mtime)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], Optional[ProbeResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, path: str) -> Optional[ProbeResult]:
+        """Probe do arquivo (None se não existir ou o ffprobe falhar); falhas também ficam em cache"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        result = _probe_uncached(path)
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+probe_cache = ProbeCache(PROBE_CACHE_SIZE)
+
+def probe_file(path: str) -> Optional[ProbeResult]:
+    """Atalho para probe_cache.probe"""
+    return probe_cache.probe(path)
@@ -0,0 +1,222 @@
+"""
+Cache de metadados do yt-dlp indexado pelo ID canônico do vídeo.
+
+Dois níveis: LRU em memória e, opcionalmente, arquivos JSON em disco.
+As entradas respeitam a expiração das URLs assinadas dos formatos e
+suportam stale-while-revalidate para as rotas de informação.
+"""
+import copy
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import yt_dlp
+
+from ..utils.config import (
+    METADATA_CACHE_SIZE,
+    METADATA_CACHE_TTL,
+    METADATA_CACHE_MAX_STALE,
+    METADATA_CACHE_DIR,
+    SIGNED_URL_EXPIRY_MARGIN,
+)
+from ..utils.helpers import extract_video_id
+
+logger = logging.getLogger(__name__)
+
+# expire=1700000000 na query ou /expire/1700000000/ nos manifestos
+EXPIRE_PATTERN = re.compile(r'[?&/]expire[=/](\d+)')
+
+def get_signed_url_expiry(info: Dict[str, Any]) -> Optional[float]:
+    """Retorna o menor timestamp de expiração entre as URLs dos formatos"""
+    expiries = []
+    for fmt in info.get('formats') or []:
+        for key in ('url', 'manifest_url', 'fragment_base_url'):
+            value = fmt.get(key)
+            if not value:
+                continue
+            match = EXPIRE_PATTERN.search(value)
+            if match:
+                expiries.append(int(match.group(1)))
+    return float(min(expiries)) if expiries else None
+
+class MetadataCache:
+    """Cache LRU de info do yt-dlp com nível opcional em disco"""
+
+    def __init__(self, max_entries: int, ttl: int, max_stale: int, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.disk_dir = disk_dir or None
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            logger.info(f"🗄️  Cache de metadados em disco: {self.disk_dir}")
+
+    def _disk_path(self, video_id: str) -> str:
+        return os.path.join(self.disk_dir, f"{video_id}.json")
+
+    def _load_from_disk(self, video_id: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(video_id)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Entrada de cache em disco inválida ({path}): {e}")
+            return None
+
+    def _save_to_disk(self, video_id: str, entry: Dict[str, Any]) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(video_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar cache em disco ({path}): {e}")
+
+    def _remember(self, video_id: str, entry: Dict[str, Any]) -> None:
+        self._entries[video_id] = entry
+        self._entries.move_to_end(video_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, video_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None:
+                self._entries.move_to_end(video_id)
+                return entry
+
+        entry = self._load_from_disk(video_id)
+        if entry is not None:
+            with self._lock:
+                self._remember(video_id, entry)
+        return entry
+
+    def get(self, url: str, require_valid_urls: bool = False) -> Optional[Tuple[Dict[str, Any], bool]]:
+        """
+        Busca o info do vídeo no cache.
+
+        Retorna (info, is_stale) ou None. Com require_valid_urls=True só
+        devolve entradas cujas URLs assinadas ainda não expiraram, que é o
+        que o download precisa para reaproveitar a extração.
+        """
+        video_id = extract_video_id(url)
+        if not video_id:
+            return None
+
+        entry = self._lookup(video_id)
+        now = time.time()
+        if entry is None:
+            self.misses += 1
+            return None
+
+        age = now - entry['stored_at']
+        urls_valid = entry.get('expires_at') is None or now < entry['expires_at'] - SIGNED_URL_EXPIRY_MARGIN
+
+        if require_valid_urls:
+            if not urls_valid or age > self.max_stale:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(entry['info']), False
+
+        if age <= self.ttl and urls_valid:
+            self.hits += 1
+            return copy.deepcopy(entry['info']), False
+
+        if age <= self.max_stale:
+            self.stale_hits += 1
+            return copy.deepcopy(entry['info']), True
+
+        self.misses += 1
+        return None
+
+    def put(self, url: str, info: Dict[str, Any]) -> None:
+        """Armazena o info extraído nos dois níveis"""
+        video_id = extract_video_id(url)
+        if not video_id or not info:
+            return
+
+        entry = {
+            'stored_at': time.time(),
+            'expires_at': get_signed_url_expiry(info),
+            'info': yt_dlp.YoutubeDL.sanitize_info(info),
+        }
+        with self._lock:
+            self._remember(video_id, entry)
+        self._save_to_disk(video_id, entry)
+
+    def invalidate(self, url: str) -> None:
+        """Remove o vídeo do cache (memória e disco)"""
+        video_id = extract_video_id(url)
+        if not video_id:
+            return
+        with self._lock:
+            self._entries.pop(video_id, None)
+        if self.disk_dir:
+            try:
+                os.remove(self._disk_path(video_id))
+            except FileNotFoundError:
+                pass
+
+    def revalidate(self, url: str, fetch: Callable[[str], Dict[str, Any]]) -> None:
+        """Atualiza a entrada em segundo plano (uma revalidação por vídeo por vez)"""
+        from .executor import get_executor
+
+        video_id = extract_video_id(url)
+        if not video_id:
+            return
+        with self._lock:
+            if video_id in self._revalidating:
+                return
+            self._revalidating.add(video_id)
+
+        def _refresh():
+            try:
+                self.put(url, fetch(url))
+                logger.info(f"🔄 Metadados revalidados: {video_id}")
+            except Exception as e:
+                logger.warning(f"Falha ao revalidar metadados de {video_id}: {e}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(video_id)
+
+        get_executor('io').submit(_refresh)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores do cache para diagnóstico"""
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'entries': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'disk_dir': self.disk_dir,
+        }
+
+metadata_cache = MetadataCache(
+    max_entries=METADATA_CACHE_SIZE,
+    ttl=METADATA_CACHE_TTL,
+    max_stale=METADATA_CACHE_MAX_STALE,
+    disk_dir=METADATA_CACHE_DIR,
+)
@@ -0,0 +1,189 @@
+"""
+Recodificação paralela por segmentos de keyframe.
+
+Um único libx264 não aproveita bem máquinas com muitos núcleos em vídeos
+longos. Aqui o vídeo é cortado nos keyframes (segment muxer, por cópia), cada
+segmento é recodificado por um ffmpeg próprio (até PARALLEL_REENCODE_WORKERS
+ao mesmo tempo), o áudio é processado uma única vez em paralelo e tudo é
+unido pelo concat demuxer. A duração da saída é conferida com a da entrada:
+qualquer divergência faz o chamador usar o caminho de um só processo.
+"""
+import asyncio
+import glob
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, List, Optional
+
+from ..utils.config import (
+    FFMPEG_REENCODE_TIMEOUT_FACTOR, PARALLEL_REENCODE, PARALLEL_REENCODE_MIN_DURATION, PARALLEL_REENCODE_WORKERS
+)
+from ..utils.ffmpeg_locator import get_ffprobe_path
+from .ffmpeg_runner import ProgressCallback, conversion_timeout, run_ffmpeg_async
+from .media_probe import probe_file
+
+logger = logging.getLogger(__name__)
+
+# Mais segmentos que workers equilibra a carga entre trechos simples e complexos do vídeo
+SEGMENTS_PER_WORKER = 2
+
+# Diferença de duração aceita entre entrada e saída
+DURATION_TOLERANCE_SECONDS = 0.5
+DURATION_TOLERANCE_RATIO = 0.005
+
+def should_parallelize(duration: Optional[float], workers: Optional[int] = None) -> bool:
+    """Vale a pena cortar em segmentos? (habilitado, mais de um worker e vídeo longo)"""
+    workers = workers or PARALLEL_REENCODE_WORKERS
+    return PARALLEL_REENCODE and workers > 1 and bool(duration) and duration >= PARALLEL_REENCODE_MIN_DURATION
+
+def keyframe_times(path: str) -> List[float]:
+    """Instantes dos keyframes do primeiro stream de vídeo (lidos dos pacotes, sem decodificar)"""
+    cmd = [get_ffprobe_path(), '-v', 'error', '-select_streams', 'v:0',
+           '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path]
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if flags.startswith('K') and pts_time not in ('', 'N/A'):
+            times.append(float(pts_time))
+    return sorted(times)
+
+def choose_split_points(keyframes: List[float], duration: float, segments: int) -> List[float]:
+    """Keyframe mais próximo de cada fronteira ideal (duration × i / segments)"""
+    points: List[float] = []
+    for i in range(1, segments):
+        target = duration * i / segments
+        candidates = [t for t in keyframes if t > (points[-1] if points else 0) and t < duration]
+        if not candidates:
+            break
+        nearest = min(candidates, key=lambda t: abs(t - target))
+        if nearest not in points:
+            points.append(nearest)
+    return points
+
+def _duration_matches(expected: float, actual: Optional[float]) -> bool:
+    if not actual:
+        return False
+    return abs(actual - expected) <= max(DURATION_TOLERANCE_SECONDS, expected * DURATION_TOLERANCE_RATIO)
+
+async def parallel_reencode_async(video_input: str, audio_input: Optional[str], output_path: str,
+                                  video_codec_args: List[str], audio_codec_args: List[str],
+                                  output_args: List[str], duration: Optional[float] = None,
+                                  on_progress: Optional[ProgressCallback] = None,
+                                  workers: Optional[int] = None) -> bool:
+    """
+    Recodifica video_input em segmentos paralelos e grava output_path.
+
+    video_codec_args/audio_codec_args são os '-c:v ...'/'-c:a ...' do caminho
+    de um só processo; output_args vão no comando final (ex.: -movflags).
+    Retorna False (sem deixar output_path) se algo falhar.
+    """
+    workers = workers or PARALLEL_REENCODE_WORKERS
+    probe = probe_file(video_input)
+    duration = (probe.duration if probe else None) or duration
+    if not duration:
+        return False
+
+    keyframes = keyframe_times(video_input)
+    points = choose_split_points(keyframes, duration, workers * SEGMENTS_PER_WORKER)
+    if not points:
+        logger.info("🧱 Vídeo sem keyframes suficientes para segmentar, usando um só processo")
+        return False
+
+    workdir = tempfile.mkdtemp(prefix='parallel_', dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        # 1) Corte por cópia nos keyframes escolhidos (só o vídeo)
+        split = await run_ffmpeg_async([
+            '-y', '-i', video_input, '-map', '0:v:0', '-c', 'copy',
+            '-f', 'segment', '-segment_times', ','.join(f"{t:.6f}" for t in points), '-reset_timestamps', '1',
+            os.path.join(workdir, 'part%04d.mkv')
+        ], duration)
+        parts = sorted(glob.glob(os.path.join(workdir, 'part*.mkv')))
+        if not split.ok or len(parts) != len(points) + 1:
+            logger.warning(f"⚠️ Corte em segmentos falhou ({len(parts)} de {len(points) + 1}): {split.stderr[-500:]}")
+            return False
+
+        bounds = [0.0] + points + [duration]
+        part_durations = [end - start for start, end in zip(bounds, bounds[1:])]
+        done: Dict[int, float] = {}
+
+        def part_progress(index: int):
+            def callback(percent: Optional[float], speed: Optional[str]) -> None:
+                if percent is None or on_progress is None:
+                    return
+                done[index] = part_durations[index] * percent / 100
+                on_progress(min(99.9, sum(done.values()) / duration * 100), None)
+            return callback
+
+        # 2) Recodificação dos segmentos e do áudio, no máximo `workers` ffmpegs ao mesmo tempo
+        semaphore = asyncio.Semaphore(workers)
+        threads = str(max(1, (os.cpu_count() or 1) // workers))
+
+        async def limited(args: List[str], seconds: float, callback: Optional[ProgressCallback] = None):
+            async with semaphore:
+                return await run_ffmpeg_async(args, seconds, callback,
+                                              conversion_timeout(seconds, FFMPEG_REENCODE_TIMEOUT_FACTOR))
+
+        encoded = [os.path.join(workdir, f'enc{index:04d}.mkv') for index in range(len(parts))]
+        jobs = [
+            limited(['-y', '-i', part, '-an', *video_codec_args, '-threads', threads, target],
+                    part_durations[index], part_progress(index))
+            for index, (part, target) in enumerate(zip(parts, encoded))
+        ]
+        audio_path = os.path.join(workdir, 'audio.mka')
+        audio_probe = probe_file(audio_input) if audio_input else None
+        if audio_input and (audio_probe is None or audio_probe.audio is not None):
+            jobs.append(limited(['-y', '-i', audio_input, '-map', '0:a:0?', '-vn', *audio_codec_args, audio_path],
+                                duration))
+        results = await asyncio.gather(*jobs)
+        failed = [result for result in results if not result.ok]
+        if failed:
+            logger.warning(f"⚠️ {len(failed)} segmento(s) falharam na recodificação: {failed[0].stderr[-500:]}")
+            return False
+
+        # 3) Concatenação por cópia + áudio
+        list_path = os.path.join(workdir, 'parts.txt')
+        with open(list_path, 'w') as f:
+            for target in encoded:
+                f.write("file '{}'\n".format(target.replace("'", "'\\''")))
+        args = ['-y', '-f', 'concat', '-safe', '0', '-i', list_path]
+        has_audio = os.path.exists(audio_path) and os.path.getsize(audio_path) > 0
+        if has_audio:
+            args += ['-i', audio_path, '-map', '0:v:0', '-map', '1:a:0']
+        concat = await run_ffmpeg_async(args + ['-c', 'copy', *output_args, output_path], duration)
+        if not concat.ok:
+            logger.warning(f"⚠️ Concatenação dos segmentos falhou: {concat.stderr[-500:]}")
+            return False
+
+        # 4) A saída precisa ter a duração da entrada
+        output_probe = probe_file(output_path)
+        actual = output_probe.duration if output_probe else None
+        if not _duration_matches(duration, actual):
+            logger.warning(f"⚠️ Duração da saída paralela ({actual}s) difere da entrada ({duration:.3f}s)")
+            return False
+
+        if on_progress:
+            on_progress(100.0, None)
+        logger.info(f"🧱 Recodificação paralela concluída: {len(parts)} segmentos, {workers} workers, "
+                    f"duração {actual:.2f}s (entrada {duration:.2f}s)")
+        return True
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def parallel_reencode(video_input: str, audio_input: Optional[str], output_path: str,
+                      video_codec_args: List[str], audio_codec_args: List[str],
+                      output_args: List[str], duration: Optional[float] = None,
+                      on_progress: Optional[ProgressCallback] = None,
+                      workers: Optional[int] = None) -> bool:
+    """Versão síncrona de parallel_reencode_async; apaga a saída parcial se falhar"""
+    try:
+        success = asyncio.run(parallel_reencode_async(video_input, audio_input, output_path, video_codec_args,
+                                                      audio_codec_args, output_args, duration, on_progress, workers))
+    except Exception as e:
+        logger.error(f"❌ Erro na recodificação paralela: {e}")
+        success = False
+    if not success and os.path.exists(output_path):
+        os.remove(output_path)
+    return success
@@ -0,0 +1,319 @@
+"""
+Planejador de pós-processamento.
+
+Antes, um job podia passar o arquivo inteiro pelo ffmpeg várias vezes: o
+merger do yt-dlp, o FixupM4a, o FFmpegExtractAudio e depois o nosso remux
+para MP4. Agora o yt-dlp só baixa os streams escolhidos, e este módulo olha
+o que chegou (probe de cada arquivo) e o que o cliente pediu para montar um
+único comando ffmpeg, ou nenhum quando o arquivo já serve como está: no
+container pedido com codecs compatíveis, ou num container que o cliente
+declarou aceitar (VideoRequest.accept_containers). Áudio em passthrough
+só é remuxado para m4a (AAC) ou Ogg (Opus/Vorbis); MP3 recodifica.
+"""
+import logging
+import os
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..models.schemas import VideoRequest
+from ..utils.config import FFMPEG_REENCODE_TIMEOUT_FACTOR
+from .ffmpeg_runner import ProgressCallback, conversion_timeout, run_ffmpeg
+from .format_selector import accepted_containers, is_audio_request, resolve_container
+from .media_probe import ProbeResult, probe_file
+from .parallel_encode import parallel_reencode, should_parallelize
+from .video_converter import MP4_AUDIO_CODECS, MP4_VIDEO_CODECS, mp4_movflags, resolve_mp4_mode
+
+logger = logging.getLogger(__name__)
+
+# Codecs aceitos por cópia em cada container final (None = qualquer um)
+CONTAINER_CODECS = {
+    'mp4': (MP4_VIDEO_CODECS, MP4_AUDIO_CODECS),
+    'webm': (('vp8', 'vp9', 'av1'), ('opus', 'vorbis')),
+    'mkv': (None, None),
+    'mp3': ((), ('mp3',)),
+    'm4a': ((), ('aac', 'alac')),
+    'opus': ((), ('opus',)),
+    'ogg': ((), ('opus', 'vorbis')),
+}
+
+# Passthrough de áudio: container final pelo codec baixado (demais codecs viram AAC em m4a)
+PASSTHROUGH_CONTAINERS = {'aac': 'm4a', 'alac': 'm4a', 'opus': 'opus', 'vorbis': 'ogg', 'mp3': 'mp3'}
+
+# Encoder e argumentos usados quando o codec não pode ser copiado
+VIDEO_ENCODERS = {
+    'mp4': ['libx264', '-preset', 'fast', '-crf', '23'],
+    'webm': ['libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-b:v', '0', '-crf', '32'],
+    'mkv': ['libx264', '-preset', 'fast', '-crf', '23'],
+}
+AUDIO_ENCODERS = {
+    'mp4': ['aac', '-b:a', '128k'],
+    'webm': ['libopus', '-b:a', '128k'],
+    'mkv': ['aac', '-b:a', '128k'],
+    'mp3': ['libmp3lame', '-b:a', '192k'],
+    'm4a': ['aac', '-b:a', '192k'],
+    'opus': ['libopus', '-b:a', '128k'],
+    'ogg': ['libopus', '-b:a', '128k'],
+}
+
+class PostProcessPlan:
+    """O que fazer com os arquivos baixados: nenhum comando ou um único ffmpeg"""
+
+    def __init__(self, kind: str, inputs: List[str], output_path: str,
+                 args: Optional[List[str]], fallback_args: Optional[List[str]], legacy_passes: int,
+                 duration: Optional[float] = None, negotiated: bool = False):
+        self.kind = kind  # 'none', 'remux', 'merge', 'audio_transcode', 'extract_audio', 'reencode'
+        self.inputs = inputs
+        self.output_path = output_path
+        self.args = args
+        self.fallback_args = fallback_args
+        self.legacy_passes = legacy_passes
+        self.duration = duration  # do probe, para progresso/timeout quando o extrator não informa
+        self.negotiated = negotiated  # remux evitado porque o cliente aceita o container entregue
+        self.passes = 0
+        self.cpu_seconds = 0.0
+        # Recodificação: argumentos de parallel_reencode (entradas, codecs, opções de saída)
+        self.parallel: Optional[Dict[str, Any]] = None
+        self.input_bytes = sum(os.path.getsize(path) for path in inputs if os.path.exists(path))
+
+    @property
+    def passes_saved(self) -> int:
+        return max(0, self.legacy_passes - self.passes)
+
+    @property
+    def bytes_saved(self) -> int:
+        # Cada passada lê e reescreve o arquivo inteiro
+        return self.passes_saved * self.input_bytes
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'plan': self.kind,
+            'passes': self.passes,
+            'legacy_passes': self.legacy_passes,
+            'passes_saved': self.passes_saved,
+            'bytes_saved': self.bytes_saved,
+            'negotiated': self.negotiated,
+            'cpu_seconds': round(self.cpu_seconds, 3),
+        }
+
+def legacy_pass_count(formats: List[Dict[str, Any]], request: VideoRequest) -> int:
+    """Passadas de ffmpeg que o pipeline antigo (merger/fixup/extract audio/remux) faria"""
+    passes = 0
+    if len(formats) > 1:
+        passes += 1  # FFmpegMerger
+    elif formats and formats[0].get('container') == 'm4a_dash':
+        passes += 1  # FFmpegFixupM4a
+    if is_audio_request(request):
+        passes += 1  # FFmpegExtractAudio
+    else:
+        # merge_output_format definia o container do merge; arquivo único mantinha o seu
+        ext = resolve_container(request) if len(formats) > 1 else (formats[0].get('ext') if formats else None)
+        if ext != 'mp4':
+            passes += 1  # remux para MP4 após o download
+    return passes
+
+def _codec_args(stream_type: str, codec: Optional[str], container: str) -> Tuple[List[str], bool]:
+    """(argumentos -c:v/-c:a, copiado?) para um stream"""
+    allowed = CONTAINER_CODECS[container][0 if stream_type == 'v' else 1]
+    if codec is None or allowed is None or codec in allowed:
+        return [f'-c:{stream_type}', 'copy'], True
+    encoders = VIDEO_ENCODERS if stream_type == 'v' else AUDIO_ENCODERS
+    encoder, *extra = encoders[container]
+    return [f'-c:{stream_type}', encoder, *extra], False
+
+def _find_stream(probes: List[Optional[ProbeResult]], stream_type: str) -> Tuple[Optional[int], Optional[str]]:
+    """(índice do arquivo de entrada, codec) do primeiro stream do tipo pedido"""
+    for index, probe in enumerate(probes):
+        if probe is None:
+            continue
+        stream = probe.video if stream_type == 'video' else probe.audio
+        if stream is not None:
+            return index, stream.codec_name
+    # Sem probe: assumir o primeiro arquivo e deixar o ffmpeg decidir (mapeamento opcional)
+    if all(probe is None for probe in probes):
+        return 0, None
+    return None, None
+
+def plan_postprocessing(inputs: List[str], formats: List[Dict[str, Any]], request: VideoRequest,
+                        output_base: str) -> PostProcessPlan:
+    """
+    Monta o plano para levar os arquivos baixados ao container pedido.
+
+    inputs são os arquivos de cada formato selecionado (vídeo e áudio
+    separados num DASH), output_base é o caminho final sem extensão.
+    """
+    audio_only = is_audio_request(request)
+    container = resolve_container(request)
+    legacy_passes = legacy_pass_count(formats, request)
+    probes = [probe_file(path) for path in inputs]
+    duration = max((probe.duration for probe in probes if probe and probe.duration), default=None)
+
+    video_index, video_codec = (None, None) if audio_only else _find_stream(probes, 'video')
+    audio_index, audio_codec = _find_stream(probes, 'audio')
+    if container == 'audio':
+        container = PASSTHROUGH_CONTAINERS.get(audio_codec, 'm4a')
+    output_path = f"{output_base}.{container}"
+    used = sorted({index for index in (video_index, audio_index) if index is not None}) or [0]
+
+    video_args, video_copied = _codec_args('v', video_codec, container) if video_index is not None else ([], True)
+    audio_args, audio_copied = _codec_args('a', audio_codec, container) if audio_index is not None else ([], True)
+
+    # Um único arquivo que já está no container pedido com codecs aceitos: nada a fazer.
+    # Fragmentos DASH (m4a_dash) ainda passam por um remux, como o FixupM4a do yt-dlp fazia,
+    # e o MP4 baixado não é fragmentado: o modo 'fragmented' também precisa do remux
+    single = inputs[used[0]]
+    delivered = os.path.splitext(single)[1].lstrip('.').lower()
+    dash = any((fmt.get('container') or '').endswith('_dash') for fmt in formats)
+    refragment = delivered == 'mp4' and not audio_only and resolve_mp4_mode(request.mp4_mode) == 'fragmented'
+    must_remux = dash or refragment
+    if len(used) == 1 and not must_remux and video_copied and audio_copied and single.lower().endswith(f'.{container}'):
+        logger.info(f"🧩 Pós-processamento: nenhum (arquivo já é {container.upper()} com codecs compatíveis)")
+        return PostProcessPlan('none', [single], single, None, None, legacy_passes, duration)
+
+    # Container diferente do pedido, mas aceito pelo cliente: servir como está
+    if len(used) == 1 and not must_remux and delivered in accepted_containers(request):
+        logger.info(f"🧩 Pós-processamento: nenhum ({delivered.upper()} aceito pelo cliente, remux para "
+                    f"{container.upper()} evitado)")
+        return PostProcessPlan('none', [single], single, None, None, legacy_passes, duration, negotiated=True)
+
+    output_args: List[str] = []
+    if container == 'mp4':
+        output_args = ['-movflags', mp4_movflags(request.mp4_mode)]
+    elif container == 'm4a':
+        output_args = ['-movflags', '+faststart']
+
+    def build(video_codec_args: List[str], audio_codec_args: List[str]) -> List[str]:
+        args = ['-y']
+        for index in used:
+            args += ['-i', inputs[index]]
+        position = {index: pos for pos, index in enumerate(used)}
+        if video_index is not None:
+            args += ['-map', f"{position[video_index]}:v:0{'?' if video_codec is None else ''}"]
+        if audio_index is not None:
+            args += ['-map', f"{position[audio_index]}:a:0{'?' if audio_codec is None else ''}"]
+        args += video_codec_args + audio_codec_args
+        if audio_only:
+            args.append('-vn')
+        return args + output_args + [output_path]
+
+    if not video_copied:
+        kind = 'reencode'
+    elif not audio_copied:
+        kind = 'extract_audio' if audio_only else 'audio_transcode'
+    else:
+        kind = 'merge' if len(used) > 1 else 'remux'
+
+    args = build(video_args, audio_args)
+    fallback_args = None
+    if kind in ('remux', 'merge', 'audio_transcode') and (container in VIDEO_ENCODERS or audio_only):
+        # Se a cópia falhar (stream corrompido, codec mal identificado), recodificar tudo
+        video_encoder_args = ['-c:v', *VIDEO_ENCODERS[container]] if video_index is not None else []
+        audio_encoder_args = ['-c:a', *AUDIO_ENCODERS[container]] if audio_index is not None else []
+        fallback_args = build(video_encoder_args, audio_encoder_args)
+
+    logger.info(f"🧩 Pós-processamento: {kind} ({len(used)} entrada(s) -> {os.path.basename(output_path)}, "
+                f"vídeo: {video_codec or '-'}, áudio: {audio_codec or '-'})")
+    plan = PostProcessPlan(kind, [inputs[index] for index in used], output_path, args, fallback_args,
+                           legacy_passes, duration)
+    if kind == 'reencode':
+        plan.parallel = {
+            'video_input': inputs[video_index],
+            'audio_input': inputs[audio_index] if audio_index is not None else None,
+            'video_codec_args': video_args,
+            'audio_codec_args': audio_args,
+            'output_args': output_args,
+        }
+    return plan
+
+class PostProcessStats:
+    """Contadores de passadas executadas e economizadas pelo planejador"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._plans: Counter = Counter()
+        self.jobs = 0
+        self.passes = 0
+        self.passes_saved = 0
+        self.bytes_saved = 0
+        # Negociação de container: remuxes evitados × executados e custo medido dos executados
+        self.remux_avoided = 0
+        self.remux_avoided_bytes = 0
+        self.remux_run = 0
+        self.remux_bytes = 0
+        self.remux_cpu_seconds = 0.0
+
+    def record(self, plan: PostProcessPlan) -> None:
+        with self._lock:
+            self.jobs += 1
+            self._plans[plan.kind] += 1
+            self.passes += plan.passes
+            self.passes_saved += plan.passes_saved
+            self.bytes_saved += plan.bytes_saved
+            if plan.negotiated:
+                self.remux_avoided += 1
+                self.remux_avoided_bytes += plan.input_bytes
+            elif plan.kind == 'remux' and plan.passes == 1:
+                self.remux_run += 1
+                self.remux_bytes += plan.input_bytes
+                self.remux_cpu_seconds += plan.cpu_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            remux_total = self.remux_avoided + self.remux_run
+            # CPU economizada estimada pelo custo médio por byte dos remuxes executados
+            cpu_per_byte = self.remux_cpu_seconds / self.remux_bytes if self.remux_bytes else None
+            return {
+                'jobs': self.jobs,
+                'plans': dict(self._plans),
+                'ffmpeg_passes': self.passes,
+                'passes_saved': self.passes_saved,
+                'bytes_saved': self.bytes_saved,
+                'container_negotiation': {
+                    'remux_avoided': self.remux_avoided,
+                    'remux_run': self.remux_run,
+                    'avoidance_rate': round(self.remux_avoided / remux_total, 3) if remux_total else None,
+                    'cpu_seconds_saved': round(self.remux_avoided_bytes * cpu_per_byte, 3)
+                    if cpu_per_byte is not None else None,
+                },
+            }
+
+postprocess_stats = PostProcessStats()
+
+def execute_plan(plan: PostProcessPlan, duration: Optional[float] = None,
+                 on_progress: Optional[ProgressCallback] = None) -> Optional[str]:
+    """Executa o plano; retorna o caminho do arquivo final ou None se o ffmpeg falhar"""
+    try:
+        if plan.args is None:
+            return plan.output_path
+
+        duration = duration or plan.duration
+        if plan.parallel and should_parallelize(duration):
+            if parallel_reencode(output_path=plan.output_path, duration=duration, on_progress=on_progress,
+                                 **plan.parallel):
+                plan.passes += 3  # corte por cópia, recodificação dos segmentos, concatenação por cópia
+                return plan.output_path
+            logger.info("Recodificação paralela falhou, recodificando em um só processo...")
+
+        factor = FFMPEG_REENCODE_TIMEOUT_FACTOR if plan.kind == 'reencode' else 1.0
+        result = run_ffmpeg(plan.args, duration, on_progress, conversion_timeout(duration, factor))
+        plan.passes += 1
+        plan.cpu_seconds += result.cpu_seconds or 0.0
+
+        if not result.ok and plan.fallback_args and not result.timed_out:
+            logger.error(f"Erro no pós-processamento ({plan.kind}): {result.stderr}")
+            logger.info("Tentando recodificar com ffmpeg...")
+            result = run_ffmpeg(plan.fallback_args, duration, on_progress,
+                                conversion_timeout(duration, FFMPEG_REENCODE_TIMEOUT_FACTOR))
+            plan.passes += 1
+            plan.cpu_seconds += result.cpu_seconds or 0.0
+
+        if result.ok and os.path.exists(plan.output_path) and os.path.getsize(plan.output_path) > 0:
+            return plan.output_path
+
+        logger.error(f"Erro no pós-processamento ({plan.kind}): {result.stderr}")
+        return None
+    finally:
+        postprocess_stats.record(plan)
+        summary = plan.summary()
+        logger.info(f"🧩 Pós-processamento {plan.kind}: {summary['passes']} passada(s) de ffmpeg, "
+                    f"{summary['passes_saved']} economizada(s) (~{summary['bytes_saved'] / (1024 * 1024):.1f}MB)")
@@ -0,0 +1,145 @@
+"""
+Cache de resultados endereçado por conteúdo.
+
+Os arquivos na biblioteca se chamam video_N.mp4 e não guardam referência à
+origem. Este índice liga (ID do vídeo, formato selecionado, container, só
+áudio) ao arquivo já baixado, para que um download repetido seja servido na
+hora, sem passar pelo YouTube nem pelo ffmpeg.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..models.schemas import VideoRequest
+from ..utils.config import DOWNLOAD_DIR, RESULT_INDEX_PATH
+from ..utils.helpers import extract_video_id, normalize_youtube_url
+from .format_selector import accepted_containers, is_audio_request, normalize_quality, resolve_container
+from .video_converter import resolve_mp4_mode
+
+logger = logging.getLogger(__name__)
+
+# Campos do info do yt-dlp necessários para montar a resposta das rotas
+INFO_FIELDS = ('id', 'title', 'duration', 'uploader', 'view_count', 'upload_date', 'description', 'thumbnail')
+
+def result_key(request: VideoRequest) -> str:
+    """Chave do resultado: vídeo | seleção de formato | container | áudio [| modo MP4] [| orçamento] [| aceitos]"""
+    url = str(request.url)
+    video_id = extract_video_id(url) or normalize_youtube_url(url)
+    audio = is_audio_request(request)
+    quality = 'audio' if audio else normalize_quality(request.quality)
+    key = f"{video_id}|{quality}|{resolve_container(request)}|{'audio' if audio else 'video'}"
+    if not audio and resolve_mp4_mode(request.mp4_mode) != 'faststart':
+        key += f"|{resolve_mp4_mode(request.mp4_mode)}"
+    if request.max_bytes or request.max_seconds:
+        # Com orçamento a qualidade entregue pode ser menor: não misturar com o resultado sem orçamento
+        key += f"|budget:{request.max_bytes or ''}:{request.max_seconds or ''}"
+    if accepted_containers(request):
+        # O arquivo servido pode estar em outro container aceito pelo cliente
+        key += f"|accept:{','.join(accepted_containers(request))}"
+    return key
+
+class ResultStore:
+    """Índice persistente de resultados com contadores de hit/miss"""
+
+    def __init__(self, index_path: Optional[str]):
+        self.index_path = index_path
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+            logger.info(f"🗃️  Índice de resultados carregado: {len(self._index)} entradas")
+        except Exception as e:
+            logger.warning(f"Não foi possível carregar o índice de resultados: {e}")
+            self._index = {}
+
+    def _save(self) -> None:
+        if not self.index_path:
+            return
+        tmp_path = f"{self.index_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            logger.warning(f"Não foi possível salvar o índice de resultados: {e}")
+
+    def lookup(self, request: VideoRequest) -> Optional[Dict[str, Any]]:
+        """
+        Retorna um info mínimo (com final_filename) se o resultado já existe.
+
+        Custa um único stat: a entrada só vale se o arquivo ainda está lá com
+        o mesmo tamanho; caso contrário é descartada.
+        """
+        key = result_key(request)
+        with self._lock:
+            entry = self._index.get(key)
+
+        if entry is not None:
+            try:
+                size = os.stat(os.path.join(DOWNLOAD_DIR, entry['filename'])).st_size
+            except OSError:
+                size = None
+            if size == entry['size']:
+                with self._lock:
+                    self.hits += 1
+                logger.info(f"🗃️  Resultado em cache para {key}: {entry['filename']}")
+                return dict(entry['info'], final_filename=entry['filename'], format_id=entry.get('format_id'))
+
+            with self._lock:
+                self._index.pop(key, None)
+                self._save()
+            logger.info(f"🗃️  Entrada do índice descartada (arquivo removido ou alterado): {entry['filename']}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def record(self, request: VideoRequest, info: Dict[str, Any]) -> None:
+        """Registra o arquivo final de um download bem-sucedido"""
+        filename = info.get('final_filename')
+        if not filename:
+            return
+        try:
+            size = os.path.getsize(os.path.join(DOWNLOAD_DIR, filename))
+        except OSError:
+            return
+
+        stored_info = {field: info.get(field) for field in INFO_FIELDS}
+        thumbnails = info.get('thumbnails')
+        if thumbnails:
+            stored_info['thumbnail'] = thumbnails[-1].get('url')
+
+        with self._lock:
+            self._index[result_key(request)] = {
+                'filename': filename,
+                'size': size,
+                'format_id': info.get('format_id'),
+                'created_at': time.time(),
+                'info': stored_info,
+            }
+            self._save()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._index)
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'entries': entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+        }
+
+result_store = ResultStore(RESULT_INDEX_PATH)
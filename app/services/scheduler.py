@@ -0,0 +1,152 @@
+"""
+Agendador de jobs de download.
+
+Downloads (yt-dlp + ffmpeg) rodam no pool dedicado 'download', com número
+de workers configurável (DOWNLOAD_WORKERS) e uma fila limitada
+(DOWNLOAD_QUEUE_SIZE). Cada job expõe sua posição na fila e registra o tempo
+de espera e de execução.
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from ..utils.config import DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_SIZE
+from .executor import get_executor
+
+logger = logging.getLogger(__name__)
+
+class QueueFullError(HTTPException):
+    """A fila de downloads está cheia"""
+
+    def __init__(self, max_queue: int):
+        super().__init__(
+            status_code=503,
+            detail=f"Servidor ocupado: {max_queue} downloads já aguardam na fila. Tente novamente em instantes."
+        )
+
+class Job:
+    """Um job agendado: futuro do resultado e tempos de espera/execução"""
+
+    def __init__(self, job_id: int, scheduler: "DownloadScheduler"):
+        self.id = job_id
+        self.scheduler = scheduler
+        self.future = None
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def queue_position(self) -> int:
+        """Posição na fila (1 = próximo a rodar); 0 quando já está rodando ou terminou"""
+        return self.scheduler.position_of(self)
+
+    @property
+    def wait_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return self.started_at - self.submitted_at
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    async def wait(self) -> Any:
+        """Aguarda o resultado sem bloquear o event loop"""
+        return await asyncio.wrap_future(self.future)
+
+class DownloadScheduler:
+    """Fila FIFO limitada na frente do pool de downloads"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._waiting: deque = deque()
+        self._running = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._recent_jobs: deque = deque(maxlen=50)
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def position_of(self, job: Job) -> int:
+        with self._lock:
+            try:
+                return self._waiting.index(job) + 1
+            except ValueError:
+                return 0
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Job:
+        """Enfileira um job; levanta QueueFullError se a fila estiver cheia"""
+        with self._lock:
+            # Só conta como fila quem não vai ter um worker livre na hora
+            if self._running + len(self._waiting) >= self.workers + self.max_queue:
+                self._rejected += 1
+                logger.warning(f"🚦 Fila de downloads cheia ({self.max_queue}), recusando job")
+                raise QueueFullError(self.max_queue)
+            job = Job(next(self._ids), self)
+            self._waiting.append(job)
+
+        def run():
+            with self._lock:
+                self._waiting.remove(job)
+                self._running += 1
+            job.started_at = time.perf_counter()
+            logger.info(f"🚦 Job {job.id} iniciado após {job.wait_seconds:.2f}s na fila")
+            success = False
+            try:
+                result = func(*args, **kwargs)
+                success = True
+                return result
+            finally:
+                job.finished_at = time.perf_counter()
+                self._finish(job, success)
+
+        job.future = get_executor('download').submit(run)
+        return job
+
+    def _finish(self, job: Job, success: bool) -> None:
+        with self._lock:
+            self._running -= 1
+            if success:
+                self._completed += 1
+            else:
+                self._failed += 1
+            self._total_wait += job.wait_seconds or 0.0
+            self._total_run += job.run_seconds or 0.0
+            self._recent_jobs.append({
+                'job_id': job.id,
+                'success': success,
+                'wait_seconds': round(job.wait_seconds or 0.0, 3),
+                'run_seconds': round(job.run_seconds or 0.0, 3),
+            })
+        logger.info(f"🚦 Job {job.id} terminou em {job.run_seconds:.2f}s (espera: {job.wait_seconds:.2f}s)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas do agendador"""
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'running': self._running,
+                'queued': len(self._waiting),
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'avg_wait_seconds': round(self._total_wait / finished, 3) if finished else 0.0,
+                'avg_run_seconds': round(self._total_run / finished, 3) if finished else 0.0,
+                'recent_jobs': list(self._recent_jobs),
+            }
+
+download_scheduler = DownloadScheduler(DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_SIZE)
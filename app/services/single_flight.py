@@ -0,0 +1,118 @@
+"""
+Coalescência de requisições idênticas em andamento (single-flight).
+
+Quando vários usuários pedem o mesmo vídeo ao mesmo tempo, apenas um job
+roda: os demais se anexam a ele, acompanham o mesmo fluxo de progresso e
+recebem o mesmo arquivo final. O mesmo vale para /video/info, onde N
+requisições simultâneas resultam em uma única extração.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+from ..models.schemas import VideoRequest, DownloadProgress
+from ..utils.helpers import extract_video_id, normalize_youtube_url
+from .format_selector import accepted_containers, is_audio_request, normalize_quality, resolve_container
+from .video_converter import resolve_mp4_mode
+
+logger = logging.getLogger(__name__)
+
+def download_key(request: VideoRequest) -> Tuple:
+    """Chave de deduplicação: (vídeo, formato, só áudio, qualidade, orçamento, modo MP4, containers aceitos)"""
+    url = str(request.url)
+    audio = is_audio_request(request)
+    return (
+        extract_video_id(url) or normalize_youtube_url(url),
+        resolve_container(request),
+        audio,
+        'audio' if audio else normalize_quality(request.quality),
+        request.max_bytes,
+        request.max_seconds,
+        None if audio else resolve_mp4_mode(request.mp4_mode),
+        accepted_containers(request),
+    )
+
+def info_key(url: str) -> str:
+    """Chave de deduplicação da extração de metadados"""
+    return extract_video_id(url) or normalize_youtube_url(url)
+
+class InFlightDownload:
+    """Um download em andamento com histórico de progresso compartilhado entre os assinantes"""
+
+    def __init__(self, key: Tuple):
+        self.key = key
+        self.job = None
+        self.subscribers = 1
+        self._events: List[DownloadProgress] = []
+        self._lock = threading.Lock()
+
+    def publish(self, progress: DownloadProgress) -> None:
+        """Callback de progresso do job (chamado na thread do download)"""
+        with self._lock:
+            self._events.append(progress)
+
+    def events_since(self, index: int) -> Tuple[List[DownloadProgress], int]:
+        """Eventos publicados a partir de index, e o próximo index a ler"""
+        with self._lock:
+            return self._events[index:], len(self._events)
+
+class DownloadFlights:
+    """Registro dos downloads em andamento por chave"""
+
+    def __init__(self):
+        self._flights: Dict[Tuple, InFlightDownload] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: Tuple, start: Callable[[Callable[[DownloadProgress], None]], Any]) -> Tuple[InFlightDownload, bool]:
+        """
+        Anexa-se ao download em andamento para a chave ou inicia um novo.
+
+        start recebe o callback de progresso e deve devolver o Job agendado.
+        Retorna (flight, is_leader).
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.subscribers += 1
+                logger.info(f"🔗 Requisição anexada ao download em andamento {key} ({flight.subscribers} assinantes)")
+                return flight, False
+
+            flight = InFlightDownload(key)
+            # Se o agendamento falhar (fila cheia), nada fica registrado
+            flight.job = start(flight.publish)
+            self._flights[key] = flight
+
+        flight.job.future.add_done_callback(lambda _: self._finish(key, flight))
+        return flight, True
+
+    def _finish(self, key: Tuple, flight: InFlightDownload) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if flight.subscribers > 1:
+            logger.info(f"🔗 Download {key} atendeu {flight.subscribers} requisições com um único job")
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+class AsyncSingleFlight:
+    """Single-flight para corrotinas no event loop (usado pelas rotas de metadados)"""
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None) if self._tasks.get(key) is task else None)
+        else:
+            logger.info(f"🔗 Extração de {key} já em andamento, aguardando o mesmo resultado")
+        # shield: o cancelamento de uma requisição não cancela as demais
+        return await asyncio.shield(task)
+
+download_flights = DownloadFlights()
+info_flights = AsyncSingleFlight()
@@ -0,0 +1,139 @@
+"""
+Placar de estratégias do yt-dlp.
+
+Registra taxa de sucesso, tempo até o primeiro byte e throughput de cada
+estratégia, separados por escopo ('download' / 'info') e categoria
+('short', 'video', 'audio'), e ordena as estratégias de cada novo job
+pelo desempenho recente. O placar é persistido em JSON entre reinícios.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..utils.config import STRATEGY_SCOREBOARD_PATH, STRATEGY_SCOREBOARD_DECAY
+
+logger = logging.getLogger(__name__)
+
+def get_category(is_short: bool, audio_only: bool = False) -> str:
+    """Categoria usada para separar as estatísticas"""
+    if audio_only:
+        return 'audio'
+    return 'short' if is_short else 'video'
+
+class StrategyScoreboard:
+    """Estatísticas com decaimento exponencial por (escopo, categoria, estratégia)"""
+
+    def __init__(self, path: Optional[str], decay: float):
+        self.path = path
+        self.decay = decay
+        self._stats: Dict[str, Dict[str, Dict[str, Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._stats = json.load(f)
+            logger.info(f"📊 Placar de estratégias carregado: {self.path}")
+        except Exception as e:
+            logger.warning(f"Não foi possível carregar o placar de estratégias: {e}")
+            self._stats = {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._stats, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Não foi possível salvar o placar de estratégias: {e}")
+
+    def _entry(self, scope: str, category: str, name: str) -> Dict[str, Any]:
+        return (self._stats.setdefault(scope, {})
+                .setdefault(category, {})
+                .setdefault(name, {
+                    'attempts': 0.0,
+                    'successes': 0.0,
+                    'ttfb_seconds': None,
+                    'throughput_bps': None,
+                    'last_success_at': None,
+                    'last_failure_at': None,
+                }))
+
+    @staticmethod
+    def _ema(previous: Optional[float], value: Optional[float], weight: float = 0.3) -> Optional[float]:
+        if value is None:
+            return previous
+        if previous is None:
+            return value
+        return previous * (1 - weight) + value * weight
+
+    def record(self, scope: str, category: str, name: str, success: bool,
+               ttfb: Optional[float] = None, throughput: Optional[float] = None) -> None:
+        """Registra o resultado de uma tentativa"""
+        with self._lock:
+            entry = self._entry(scope, category, name)
+            entry['attempts'] = entry['attempts'] * self.decay + 1
+            entry['successes'] = entry['successes'] * self.decay + (1 if success else 0)
+            if success:
+                entry['ttfb_seconds'] = self._ema(entry['ttfb_seconds'], ttfb)
+                entry['throughput_bps'] = self._ema(entry['throughput_bps'], throughput)
+                entry['last_success_at'] = time.time()
+            else:
+                entry['last_failure_at'] = time.time()
+            self._save()
+
+    @staticmethod
+    def _success_rate(entry: Optional[Dict[str, Any]]) -> float:
+        # Suavização de Laplace: estratégias sem histórico ficam em 0.5
+        if not entry:
+            return 0.5
+        return (entry['successes'] + 1) / (entry['attempts'] + 2)
+
+    def rank(self, scope: str, category: str, strategies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Ordena as estratégias pela taxa de sucesso recente, depois pela latência"""
+        with self._lock:
+            table = self._stats.get(scope, {}).get(category, {})
+
+            def sort_key(strategy: Dict[str, Any]):
+                entry = table.get(strategy['name'])
+                ttfb = entry.get('ttfb_seconds') if entry else None
+                return (
+                    -round(self._success_rate(entry), 2),
+                    ttfb if ttfb is not None else float('inf'),
+                )
+
+            # sorted é estável: empates mantêm a ordem original da lista
+            ranked = sorted(strategies, key=sort_key)
+
+        if [s['name'] for s in ranked] != [s['name'] for s in strategies]:
+            logger.info(f"📊 Ordem das estratégias ({scope}/{category}): {[s['name'] for s in ranked]}")
+        return ranked
+
+    def throughput(self, scope: str, category: str, name: str) -> Optional[float]:
+        """Throughput médio recente (bytes/s) da estratégia, se já houver medição"""
+        with self._lock:
+            entry = self._stats.get(scope, {}).get(category, {}).get(name)
+            return entry.get('throughput_bps') if entry else None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Cópia do placar com a taxa de sucesso calculada, para exposição via HTTP"""
+        with self._lock:
+            result: Dict[str, Any] = {}
+            for scope, categories in self._stats.items():
+                for category, strategies in categories.items():
+                    for name, entry in strategies.items():
+                        result.setdefault(scope, {}).setdefault(category, {})[name] = dict(
+                            entry,
+                            success_rate=round(self._success_rate(entry), 3),
+                        )
+            return result
+
+strategy_scoreboard = StrategyScoreboard(STRATEGY_SCOREBOARD_PATH, STRATEGY_SCOREBOARD_DECAY)
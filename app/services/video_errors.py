@@ -0,0 +1,129 @@
+"""
+Classificação de erros do yt-dlp.
+
+Erros terminais (vídeo privado, removido, bloqueado por copyright ou região,
+exclusivo para membros) não mudam trocando de player client: o loop de
+estratégias deve parar na hora. Erros retentáveis (403, timeouts, apenas
+storyboards) seguem para a próxima estratégia.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from ..utils.config import NEGATIVE_CACHE_TTL, NEGATIVE_CACHE_SIZE
+from ..utils.helpers import extract_video_id
+
+logger = logging.getLogger(__name__)
+
+# (código, terminal, status HTTP, trechos da mensagem do yt-dlp em minúsculas)
+# A ordem importa: os retentáveis mais específicos vêm antes dos terminais genéricos
+ERROR_RULES = [
+    ('rate_limited', False, 429, ['http error 429', "try again later", 'rate-limit', 'rate limit']),
+    ('bot_check', False, 403, ['confirm you’re not a bot', "confirm you're not a bot"]),
+    ('http_403', False, 403, ['http error 403', 'forbidden']),
+    ('timeout', False, 504, ['timed out', 'timeout']),
+    ('private_video', True, 403, ['private video', 'video is private']),
+    ('members_only', True, 403, ['members-only', 'join this channel', "channel's members", 'members only']),
+    ('copyright', True, 451, ['copyright']),
+    ('region_locked', True, 451, ['not available in your country', 'blocked it in your country',
+                                  'geo restrict', 'not made this video available in your country']),
+    ('video_unavailable', True, 404, ['video unavailable', 'has been removed', 'no longer available',
+                                      'does not exist', 'account associated with this video has been terminated']),
+]
+
+ERROR_MESSAGES = {
+    'private_video': 'Vídeo privado',
+    'members_only': 'Vídeo exclusivo para membros do canal',
+    'copyright': 'Vídeo removido por reivindicação de direitos autorais',
+    'region_locked': 'Vídeo bloqueado na região do servidor',
+    'video_unavailable': 'Vídeo indisponível ou removido',
+}
+
+def classify_error(error) -> Tuple[str, bool, int]:
+    """Retorna (código, é_terminal, status HTTP) para uma exceção ou mensagem do yt-dlp"""
+    message = str(error).lower()
+    for code, terminal, status_code, patterns in ERROR_RULES:
+        if any(pattern in message for pattern in patterns):
+            return code, terminal, status_code
+    return 'unknown', False, 400
+
+class TerminalJobError(HTTPException):
+    """Erro que encerra o job na hora, sem tentar as demais estratégias"""
+
+    def __init__(self, code: str, status_code: int, message: str):
+        self.code = code
+        super().__init__(
+            status_code=status_code,
+            detail={
+                'error_code': code,
+                'message': message,
+            }
+        )
+
+class VideoUnavailableError(TerminalJobError):
+    """Erro terminal: nenhuma estratégia vai conseguir baixar o vídeo"""
+
+    def __init__(self, code: str, status_code: int, reason: str):
+        self.reason = reason
+        super().__init__(code, status_code, f"{ERROR_MESSAGES.get(code, 'Vídeo indisponível')}: {reason}")
+
+class NegativeCache:
+    """
+    Lembra por pouco tempo dos vídeos que falharam com erro terminal.
+
+    Guarda só (código, status HTTP, motivo): cada consulta cria uma exceção
+    nova, em vez de relançar (de várias threads) sempre a mesma instância.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, int, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, url: str, error: VideoUnavailableError) -> None:
+        video_id = extract_video_id(url)
+        if not video_id:
+            return
+        with self._lock:
+            self._entries[video_id] = (time.time(), (error.code, error.status_code, error.reason))
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, url: str) -> Optional[VideoUnavailableError]:
+        video_id = extract_video_id(url)
+        if not video_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                return None
+            stored_at, (code, status_code, reason) = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[video_id]
+                return None
+        return VideoUnavailableError(code, status_code, reason)
+
+negative_cache = NegativeCache(NEGATIVE_CACHE_TTL, NEGATIVE_CACHE_SIZE)
+
+def raise_if_known_unavailable(url: str) -> None:
+    """Falha imediatamente se o vídeo teve erro terminal recente"""
+    error = negative_cache.get(url)
+    if error is not None:
+        logger.info(f"⛔ Vídeo com erro terminal recente ({error.code}), falhando sem tentar estratégias")
+        raise error
+
+def check_terminal_error(url: str, error: Exception) -> None:
+    """Se o erro for terminal, registra no cache negativo e interrompe o loop de estratégias"""
+    code, terminal, status_code = classify_error(error)
+    if not terminal:
+        return
+    unavailable = VideoUnavailableError(code, status_code, str(error))
+    negative_cache.add(url, unavailable)
+    logger.error(f"⛔ Erro terminal ({code}), interrompendo as estratégias: {error}")
+    raise unavailable
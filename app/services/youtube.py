@@ -1,13 +1,39 @@
 import yt_dlp
 import os
+import time
 import logging
-from typing import Dict, Any, Callable, Optional
+import itertools
+import threading
+from concurrent.futures import Future, FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Callable, List, Optional
 from fastapi import HTTPException
 
-from ..utils.helpers import normalize_youtube_url, is_youtube_short
-from ..utils.config import DOWNLOAD_DIR
+from ..utils.helpers import (
+    normalize_youtube_url,
+    is_youtube_short,
+    extract_video_id,
+    sanitize_filename,
+    generate_video_filename,
+)
+from ..utils.config import (
+    INFO_HEDGING, INFO_HEDGE_DELAY, INFO_HEDGE_MAX_PARALLEL, BUDGET_DEFAULT_THROUGHPUT, DASH_CONCURRENT_STREAMS
+)
 from ..models.schemas import VideoRequest, DownloadProgress
-from .video_converter import find_and_convert_latest_video
+from .video_converter import validate_downloaded_video
+from .postprocess_planner import execute_plan, plan_postprocessing
+from .audio_stream import can_stream_transcode, stream_transcode_audio
+from .file_manager import create_job_dir, cleanup_job_dir, ensure_disk_space, move_into_library
+from .metadata_cache import metadata_cache
+from .strategy_scoreboard import strategy_scoreboard, get_category
+from .circuit_breaker import circuit_breakers
+from .video_errors import TerminalJobError, check_terminal_error, classify_error, raise_if_known_unavailable
+from .executor import get_executor
+from .result_store import result_store
+from .format_screening import format_rejections, screen_formats
+from .format_selector import (
+    build_format_options, describe_selection, estimate_format_size, estimate_selection_size, is_audio_request,
+    resolve_container, select_within_budget
+)
 from ..utils.ffmpeg_locator import get_ffmpeg_location_for_ytdlp
 
 logger = logging.getLogger(__name__)
@@ -20,10 +46,32 @@ class DownloadProgressTracker:
         self.last_progress = None
         self.max_percent_reached = 0.0  # Track maximum progress reached
         self.strategy_attempts = 0
+        self.strategy_started_at = None
+        self.first_byte_at = None
+        self.finished_bytes = 0
+        self.finished_at = None
+
+    def time_to_first_byte(self) -> Optional[float]:
+        """Segundos entre o início da tentativa atual e o primeiro byte recebido"""
+        if self.strategy_started_at is None or self.first_byte_at is None:
+            return None
+        return self.first_byte_at - self.strategy_started_at
+
+    def throughput(self) -> Optional[float]:
+        """Bytes por segundo da tentativa atual, do primeiro byte ao fim do download"""
+        if self.first_byte_at is None or self.finished_at is None or not self.finished_bytes:
+            return None
+        elapsed = self.finished_at - self.first_byte_at
+        return self.finished_bytes / elapsed if elapsed > 0 else None
 
     def set_strategy(self, strategy_name: str):
         self.current_strategy = strategy_name
         self.strategy_attempts += 1
+        # Medições por tentativa, usadas pelo placar de estratégias
+        self.strategy_started_at = time.perf_counter()
+        self.first_byte_at = None
+        self.finished_bytes = 0
+        self.finished_at = None
 
         # Only send "starting" message if this is the first strategy
         # Otherwise, keep the existing progress
@@ -43,6 +91,9 @@ class DownloadProgressTracker:
             if status == 'downloading':
                 downloaded = d.get('downloaded_bytes', 0)
                 total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
+
+                if downloaded and self.first_byte_at is None:
+                    self.first_byte_at = time.perf_counter()
                 speed = d.get('speed', 0)
                 eta = d.get('eta', 0)
 
@@ -105,6 +156,8 @@ class DownloadProgressTracker:
             elif status == 'finished':
                 # Garantir que chegamos a 100%
                 self.max_percent_reached = 100.0
+                self.finished_bytes += d.get('downloaded_bytes') or d.get('total_bytes') or 0
+                self.finished_at = time.perf_counter()
 
                 progress = DownloadProgress(
                     status='processing',
@@ -122,10 +175,166 @@ class DownloadProgressTracker:
         except Exception as e:
             logger.error(f"Erro no progress_hook: {e}")
 
+class StreamProgressAggregator:
+    """
+    Combina o progresso dos streams de um par DASH baixados ao mesmo tempo:
+    os hooks originais (DownloadProgressTracker) recebem um único evento com
+    bytes, total e velocidade somados, e 'finished' só quando todos terminam.
+    """
+    def __init__(self, hooks: List[Callable[[dict], None]]):
+        self.hooks = list(hooks)
+        self._lock = threading.Lock()
+        self._streams: Dict[str, Dict[str, Any]] = {}
+
+    def expect(self, formats: List[Dict[str, Any]], duration: Optional[float]) -> None:
+        """Registra os formatos que serão baixados, com o tamanho estimado de cada um"""
+        with self._lock:
+            self._streams = {
+                fmt['format_id']: {
+                    'downloaded': 0,
+                    'total': estimate_format_size(fmt, duration) or 0,
+                    'speed': 0.0,
+                    'finished': False,
+                }
+                for fmt in formats
+            } if len(formats) > 1 else {}
+
+    def _forward(self, d: dict) -> None:
+        for hook in self.hooks:
+            hook(d)
+
+    def hook(self, d: dict) -> None:
+        """Progress hook do yt-dlp; um único stream passa direto"""
+        format_id = (d.get('info_dict') or {}).get('format_id')
+        status = d.get('status')
+        with self._lock:
+            stream = self._streams.get(format_id)
+            if stream is None or status not in ('downloading', 'finished'):
+                self._forward(d)
+                return
+
+            if status == 'downloading':
+                stream['downloaded'] = d.get('downloaded_bytes') or 0
+                stream['total'] = d.get('total_bytes') or d.get('total_bytes_estimate') or stream['total']
+                stream['speed'] = d.get('speed') or 0.0
+            else:
+                stream['downloaded'] = d.get('downloaded_bytes') or d.get('total_bytes') or stream['downloaded']
+                stream['total'] = stream['downloaded']
+                stream['speed'] = 0.0
+                stream['finished'] = True
+
+            streams = self._streams.values()
+            downloaded = sum(s['downloaded'] for s in streams)
+            total = sum(max(s['total'], s['downloaded']) for s in streams)
+            speed = sum(s['speed'] for s in streams)
+            finished = all(s['finished'] for s in streams)
+            self._forward({
+                'status': 'finished' if finished else 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'speed': speed,
+                'eta': (total - downloaded) / speed if speed and total > downloaded else None,
+                'filename': d.get('filename'),
+                'info_dict': d.get('info_dict'),
+            })
+
+def _record_attempt(scope: str, category: str, name: str, success: bool,
+                    ttfb: Optional[float] = None, throughput: Optional[float] = None) -> None:
+    """Registra o resultado de uma tentativa no placar e no circuit breaker"""
+    strategy_scoreboard.record(scope, category, name, success=success, ttfb=ttfb, throughput=throughput)
+    if success:
+        circuit_breakers.record_success(scope, name)
+    else:
+        circuit_breakers.record_failure(scope, name)
+
+def _extract_info_with_strategy(normalized_url: str, strategy: Dict[str, Any], category: str) -> Dict[str, Any]:
+    """Extrai info com uma estratégia e registra o resultado no placar/breaker"""
+    attempt_start = time.perf_counter()
+    try:
+        logger.info(f"Tentando estratégia: {strategy['name']}")
+        with yt_dlp.YoutubeDL(strategy['opts']) as ydl:
+            info = ydl.extract_info(normalized_url, download=False)
+    except Exception as e:
+        logger.warning(f"Estratégia {strategy['name']} falhou: {str(e)}")
+        # Vídeo privado/removido não é culpa do client: não penalizar a estratégia,
+        # mas devolver a vaga de teste se esta tentativa era a sonda half-open
+        if classify_error(e)[1]:
+            circuit_breakers.release('info', strategy['name'])
+        else:
+            _record_attempt('info', category, strategy['name'], success=False)
+        raise
+
+    logger.info(f"Sucesso com estratégia: {strategy['name']}")
+    _record_attempt('info', category, strategy['name'], success=True,
+                    ttfb=time.perf_counter() - attempt_start)
+    return info
+
+def _get_video_info_hedged(normalized_url: str, strategies: list, category: str):
+    """
+    Extração hedged: começa pela estratégia mais bem ranqueada e dispara a
+    próxima se nenhuma resposta chegar em INFO_HEDGE_DELAY segundos (ou assim
+    que uma tentativa falhar). A primeira que tiver sucesso vence.
+
+    Retorna (info, último_erro). Tentativas perdedoras que já estão rodando não
+    podem ser interrompidas no meio do yt-dlp; seus resultados são descartados.
+    """
+    executor = get_executor('hedge')
+    remaining = iter(strategies)
+    in_flight: Dict[Future, Dict[str, Any]] = {}
+    last_error = None
+
+    def launch_next() -> bool:
+        for strategy in remaining:
+            if not circuit_breakers.allow('info', strategy['name']):
+                logger.info(f"🔌 Estratégia {strategy['name']} em cooldown, pulando...")
+                continue
+            future = executor.submit(_extract_info_with_strategy, normalized_url, strategy, category)
+            in_flight[future] = strategy
+            return True
+        return False
+
+    has_more = launch_next()
+    try:
+        while in_flight:
+            can_hedge = has_more and len(in_flight) < INFO_HEDGE_MAX_PARALLEL
+            done, _ = wait(
+                list(in_flight),
+                timeout=INFO_HEDGE_DELAY if can_hedge else None,
+                return_when=FIRST_COMPLETED
+            )
+
+            if not done:
+                # Sem resposta dentro do atraso: disparar a próxima estratégia em paralelo
+                logger.info(f"⏳ Sem resposta em {INFO_HEDGE_DELAY}s, disparando estratégia extra (hedge)")
+                has_more = launch_next()
+                continue
+
+            for future in done:
+                strategy = in_flight.pop(future)
+                try:
+                    info = future.result()
+                    logger.info(f"🏁 Hedge vencido por: {strategy['name']}")
+                    return info, None
+                except Exception as e:
+                    check_terminal_error(normalized_url, e)
+                    last_error = e
+
+            # Uma tentativa falhou: ocupar a vaga com a próxima estratégia
+            if has_more and len(in_flight) < INFO_HEDGE_MAX_PARALLEL:
+                has_more = launch_next()
+    finally:
+        # Cancelar o que ainda não começou; o resto termina em segundo plano
+        for future, strategy in in_flight.items():
+            if future.cancel():
+                circuit_breakers.release('info', strategy['name'])
+
+    return None, last_error
+
 def get_video_info_robust(url: str) -> Dict[str, Any]:
     """Extrai informações com múltiplas estratégias de fallback"""
     normalized_url = normalize_youtube_url(url)
     logger.info(f"Tentando extrair info de: {normalized_url}")
+    raise_if_known_unavailable(normalized_url)
 
     strategies = [
         {
@@ -174,33 +383,293 @@ def get_video_info_robust(url: str) -> Dict[str, Any]:
         }
     ]
 
-    last_error = None
-    for strategy in strategies:
-        try:
-            logger.info(f"Tentando estratégia: {strategy['name']}")
-            with yt_dlp.YoutubeDL(strategy['opts']) as ydl:
-                info = ydl.extract_info(normalized_url, download=False)
-                logger.info(f"Sucesso com estratégia: {strategy['name']}")
-                return info
-        except Exception as e:
-            logger.warning(f"Estratégia {strategy['name']} falhou: {str(e)}")
-            last_error = e
-            continue
+    category = get_category(is_youtube_short(url))
+    strategies = strategy_scoreboard.rank('info', category, strategies)
 
+    if INFO_HEDGING:
+        info, last_error = _get_video_info_hedged(normalized_url, strategies, category)
+        if info is not None:
+            return info
+    else:
+        last_error = None
+        for strategy in strategies:
+            if not circuit_breakers.allow('info', strategy['name']):
+                logger.info(f"🔌 Estratégia {strategy['name']} em cooldown, pulando...")
+                continue
+
+            try:
+                return _extract_info_with_strategy(normalized_url, strategy, category)
+            except Exception as e:
+                # Vídeo privado/removido: nenhuma outra estratégia vai resolver
+                check_terminal_error(normalized_url, e)
+                last_error = e
+                continue
+
+    if last_error is None:
+        raise TerminalJobError('strategies_cooldown', 503, "Todas as estratégias estão em cooldown após falhas recentes. Tente novamente em alguns minutos.")
     raise HTTPException(status_code=400, detail=f"Todos os métodos falharam. Último erro: {str(last_error)}")
 
+def get_video_info_cached(url: str) -> Dict[str, Any]:
+    """Retorna info do cache de metadados, extraindo apenas em caso de miss"""
+    cached = metadata_cache.get(url)
+    if cached is not None:
+        info, is_stale = cached
+        if is_stale:
+            # Servir a versão antiga agora e atualizar em segundo plano
+            metadata_cache.revalidate(url, get_video_info_robust)
+        logger.info(f"🗄️  Metadados servidos do cache ({'stale' if is_stale else 'fresh'})")
+        return info
+
+    info = get_video_info_robust(url)
+    metadata_cache.put(url, info)
+    return info
+
+def _log_job_timings(info: Dict[str, Any], job_timings: Dict[str, float], job_start: float, strategy_name: str) -> None:
+    """Registra os tempos do job no log e no info retornado"""
+    job_timings['total_seconds'] = round(time.perf_counter() - job_start, 3)
+    info['job_timings'] = dict(job_timings, strategy=strategy_name)
+    logger.info(
+        f"⏱️  Tempos do job ({strategy_name}): extração {job_timings.get('extract_seconds', 0):.2f}s, "
+        f"download {job_timings.get('download_seconds', 0):.2f}s, total {job_timings['total_seconds']:.2f}s"
+    )
+
+def _run_download_strategy(strategy: Dict[str, Any], normalized_url: str, request: VideoRequest,
+                           tracker: DownloadProgressTracker,
+                           progress_callback: Optional[Callable[[DownloadProgress], None]],
+                           job_timings: Dict[str, float], category: str,
+                           cached_info: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Executa uma estratégia de download. Retorna o info em caso de sucesso ou None para tentar a próxima"""
+    logger.info(f"🔄 Tentando download com estratégia: {strategy['name']}")
+
+    # Cada tentativa baixa no seu próprio diretório, com nome determinístico pelo ID
+    job_dir = create_job_dir(extract_video_id(normalized_url))
+    opts = dict(strategy['opts'], outtmpl=os.path.join(job_dir, '%(id)s.%(ext)s'))
+    try:
+        return _download_into_job_dir(
+            strategy, opts, job_dir, normalized_url, request, progress_callback, job_timings, category, cached_info
+        )
+    finally:
+        cleanup_job_dir(job_dir)
+
+def _library_name_factory(info: Dict[str, Any], extension: str, audio_only: bool) -> Callable[[], str]:
+    """Gera candidatos de nome para o arquivo final na biblioteca"""
+    if not audio_only:
+        return lambda: generate_video_filename(extension)
+
+    # Áudio mantém o título como nome, com sufixo em caso de colisão
+    base = sanitize_filename(info.get('title') or '') or 'audio'
+    attempts = itertools.count()
+
+    def next_name() -> str:
+        attempt = next(attempts)
+        return f"{base}.{extension}" if attempt == 0 else f"{base} ({attempt}).{extension}"
+    return next_name
+
+def _download_selected_streams(ydl: yt_dlp.YoutubeDL, info: Dict[str, Any], job_dir: str, base_name: str,
+                               progress: StreamProgressAggregator) -> List[str]:
+    """
+    Baixa cada formato selecionado (vídeo e áudio separados num DASH) sem os
+    pós-processadores do yt-dlp (merger, fixups, extração de áudio): o
+    planejador de pós-processamento junta/converte tudo num único ffmpeg.
+    Os streams de um par DASH são baixados ao mesmo tempo.
+    """
+    formats = info.get('requested_formats') or [info]
+    progress.expect(formats, info.get('duration'))
+
+    def fetch(fmt: Dict[str, Any]) -> Optional[str]:
+        format_info = dict(info)
+        format_info.pop('requested_formats', None)
+        format_info.update(fmt)
+        path = os.path.join(job_dir, f"{base_name}.f{fmt['format_id']}.{fmt['ext']}")
+        success, _ = ydl.dl(path, format_info)
+        if not success or not os.path.exists(path) or os.path.getsize(path) == 0:
+            logger.warning(f"⚠️ Formato {fmt['format_id']} não foi baixado")
+            return None
+        return path
+
+    if len(formats) > 1 and DASH_CONCURRENT_STREAMS:
+        logger.info(f"⚡ Baixando {len(formats)} streams simultaneamente: "
+                    f"{', '.join(fmt['format_id'] for fmt in formats)}")
+        with ThreadPoolExecutor(max_workers=len(formats), thread_name_prefix='stream') as pool:
+            paths = list(pool.map(fetch, formats))
+        return paths if all(paths) else []
+
+    paths = []
+    for fmt in formats:
+        path = fetch(fmt)
+        if path is None:
+            return []
+        paths.append(path)
+    return paths
+
+def _reselect_formats(ydl: yt_dlp.YoutubeDL, info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Refaz a seleção de formatos de um info já processado.
+
+    O yt-dlp só faz info.update(formato escolhido): sem limpar a seleção
+    anterior, um requested_formats (par DASH) ou um filesize antigo sobrevive
+    quando a nova escolha é um formato único.
+    """
+    previous = info.pop('requested_formats', None) or [
+        fmt for fmt in info.get('formats') or [] if fmt.get('format_id') == info.get('format_id')
+    ]
+    for fmt in previous:
+        for key in fmt:
+            info.pop(key, None)
+    return ydl.process_ie_result(info, download=False)
+
+def _download_into_job_dir(strategy: Dict[str, Any], opts: Dict[str, Any], job_dir: str,
+                           normalized_url: str, request: VideoRequest,
+                           progress_callback: Optional[Callable[[DownloadProgress], None]],
+                           job_timings: Dict[str, float], category: str,
+                           cached_info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Baixa, processa e move o arquivo do job para a biblioteca"""
+    # Os hooks da estratégia recebem o progresso combinado dos streams
+    stream_progress = StreamProgressAggregator(opts.get('progress_hooks') or [])
+    with yt_dlp.YoutubeDL({**opts, 'progress_hooks': [stream_progress.hook]}) as ydl:
+        # Primeiro obter info (única extração do job)
+        extract_start = time.perf_counter()
+        if cached_info is not None:
+            logger.info("🗄️  Reaproveitando extração do cache de metadados")
+            info = _reselect_formats(ydl, cached_info)
+        else:
+            info = ydl.extract_info(normalized_url, download=False)
+            if info:
+                metadata_cache.put(normalized_url, info)
+        job_timings['extract_seconds'] = round(time.perf_counter() - extract_start, 3)
+
+        if not info:
+            logger.warning(f"⚠️ Estratégia {strategy['name']}: Não conseguiu obter informações do vídeo")
+            return None
+
+        # Descartar storyboards e formatos sem mídia antes de transferir qualquer byte
+        usable_formats, rejected = screen_formats(info, is_audio_request(request))
+        if not usable_formats:
+            logger.warning(f"⚠️ Estratégia {strategy['name']}: Apenas storyboards/formatos inúteis disponíveis, pulando...")
+            format_rejections.record_skip(strategy['name'])
+            return None
+        if rejected:
+            # A seleção feita na extração pode ter apontado para um formato descartado
+            info = _reselect_formats(ydl, info)
+
+        # Orçamento de tamanho/tempo: trocar pela melhor combinação que cabe nele
+        throughput = strategy_scoreboard.throughput('download', category, strategy['name']) or BUDGET_DEFAULT_THROUGHPUT
+        budget_choice = select_within_budget(info, request, throughput)
+        if budget_choice is not None:
+            ydl.format_selector = ydl.build_format_selector(budget_choice[0])
+            info = _reselect_formats(ydl, info)
+
+        selection = describe_selection(info)
+        info['format_selection'] = selection
+
+        # Checagem de espaço em disco antes de escrever qualquer byte
+        estimated_size = estimate_selection_size(info)
+        if estimated_size:
+            ensure_disk_space(estimated_size)
+        logger.info(f"🎞️  Formato escolhido: itag(s) {'+'.join(filter(None, selection['itags']))} "
+                    f"({selection.get('height') or '?'}p, {selection.get('ext')})")
+
+        logger.info(f"✅ Info obtida, iniciando download...")
+        logger.info(f"📹 Título: {info.get('title', 'N/A')}")
+        logger.info(f"⏱️  Duração: {info.get('duration', 'N/A')} segundos")
+        logger.info(f"📊 Formatos utilizáveis: {len(usable_formats)}")
+
+        # Depois fazer download reaproveitando o info já extraído.
+        # ydl.download([url]) extrairia o vídeo de novo (página, player JS, assinaturas)
+        base_name = sanitize_filename(str(info.get('id') or '')) or 'media'
+        download_start = time.perf_counter()
+        final_path = None
+        if can_stream_transcode(info, request):
+            # MP3 explícito: transcodificar enquanto baixa; se falhar, caminho em duas etapas
+            final_path = stream_transcode_audio(ydl, info, os.path.join(job_dir, f"{base_name}.mp3"),
+                                                opts.get('progress_hooks') or [])
+            if final_path:
+                info['postprocessing'] = {'plan': 'stream_transcode', 'passes': 1}
+        if final_path is None:
+            downloaded_paths = _download_selected_streams(ydl, info, job_dir, base_name, stream_progress)
+            if not downloaded_paths:
+                logger.warning(f"⚠️ Estratégia {strategy['name']}: nenhum arquivo no diretório do job")
+                return None
+        job_timings['download_seconds'] = round(time.perf_counter() - download_start, 3)
+
+        logger.info(f"✅ Download bem-sucedido com estratégia: {strategy['name']}")
+
+    if final_path is None:
+        final_path = _postprocess_downloads(downloaded_paths, info, request, strategy, progress_callback,
+                                            os.path.join(job_dir, base_name))
+        if not final_path:
+            return None
+
+    extension = os.path.splitext(final_path)[1].lstrip('.') or 'mp4'
+    final_filename = move_into_library(final_path, _library_name_factory(info, extension, is_audio_request(request)))
+    info['final_filename'] = final_filename
+    logger.info(f"✅ Arquivo final processado: {final_filename}")
+
+    if progress_callback:
+        progress_callback(DownloadProgress(
+            status='completed',
+            progress_percent=100.0,
+            current_strategy=strategy['name'],
+            message='Download de áudio concluído!' if is_audio_request(request) else 'Download concluído com sucesso!',
+            filename=final_filename
+        ))
+
+    return info
+
+def _postprocess_downloads(downloaded_paths: List[str], info: Dict[str, Any], request: VideoRequest,
+                           strategy: Dict[str, Any],
+                           progress_callback: Optional[Callable[[DownloadProgress], None]],
+                           output_base: str) -> Optional[str]:
+    """Valida os arquivos baixados e executa o plano de pós-processamento; retorna o arquivo final"""
+    # Validar o vídeo antes de gastar ffmpeg com ele
+    if not is_audio_request(request):
+        total_bytes = sum(os.path.getsize(path) for path in downloaded_paths)
+        if not validate_downloaded_video(downloaded_paths[0], total_bytes):
+            logger.warning("⚠️ Arquivo baixado inválido, tentando próxima estratégia...")
+            return None
+
+    # Um único comando ffmpeg (ou nenhum) do que foi baixado até o container pedido
+    requested_formats = info.get('requested_formats') or [info]
+    plan = plan_postprocessing(downloaded_paths, requested_formats, request, output_base)
+    if plan.args is not None:
+        target = resolve_container(request).upper()
+        if progress_callback:
+            progress_callback(DownloadProgress(
+                status='converting',
+                progress_percent=100.0,
+                current_strategy=strategy['name'],
+                message=f'Convertendo para {target}...'
+            ))
+
+        def on_convert_progress(percent: Optional[float], speed: Optional[str]) -> None:
+            if progress_callback:
+                progress_callback(DownloadProgress(
+                    status='converting',
+                    progress_percent=round(percent, 1) if percent is not None else None,
+                    speed=speed,
+                    current_strategy=strategy['name'],
+                    message=f"Convertendo para {target}... {percent:.0f}%" if percent is not None else f'Convertendo para {target}...'
+                ))
+    else:
+        on_convert_progress = None
+
+    final_path = execute_plan(plan, info.get('duration'), on_convert_progress)
+    info['postprocessing'] = plan.summary()
+    if not final_path:
+        logger.warning("⚠️ Conversão não produziu arquivo final, tentando próxima estratégia...")
+        return None
+    return final_path
+
 def download_video_robust(url: str, request: VideoRequest, progress_callback: Optional[Callable[[DownloadProgress], None]] = None) -> Dict[str, Any]:
     """Baixa vídeo com múltiplas estratégias de fallback e converte para MP4"""
     normalized_url = normalize_youtube_url(url)
     is_short = is_youtube_short(url)
     logger.info(f"Tentando baixar: {normalized_url} (Short: {is_short})")
+    raise_if_known_unavailable(normalized_url)
 
     # Inicializar tracker de progresso
     tracker = DownloadProgressTracker(progress_callback)
 
-    # Template simples - deixar yt-dlp decidir o nome temporariamente
-    output_template = f"{DOWNLOAD_DIR}/%(title)s.%(ext)s"
-
     # 🔧 CONFIGURAR LOCALIZAÇÃO DO FFMPEG
     # Isso é CRÍTICO para o executável funcionar!
     ffmpeg_location = get_ffmpeg_location_for_ytdlp()
@@ -214,8 +683,6 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
         {
             'name': 'MediaConnect Client',
             'opts': {
-                'format': 'best',
-                'outtmpl': output_template,
                 'quiet': False,
                 'no_warnings': False,
                 'progress_hooks': [tracker.progress_hook],
@@ -232,8 +699,6 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
         {
             'name': 'iOS Music Client',
             'opts': {
-                'format': 'best',
-                'outtmpl': output_template,
                 'quiet': False,
                 'no_warnings': False,
                 'progress_hooks': [tracker.progress_hook],
@@ -250,8 +715,6 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
         {
             'name': 'Android Music Client',
             'opts': {
-                'format': 'best',
-                'outtmpl': output_template,
                 'quiet': False,
                 'no_warnings': False,
                 'progress_hooks': [tracker.progress_hook],
@@ -268,8 +731,6 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
         {
             'name': 'Web Client - Modern',
             'opts': {
-                'format': 'best',
-                'outtmpl': output_template,
                 'quiet': False,
                 'no_warnings': False,
                 'progress_hooks': [tracker.progress_hook],
@@ -292,13 +753,10 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
         {
             'name': 'Direct - No Client Override',
             'opts': {
-                'format': '(bestvideo[height<=1080]+bestaudio)/best',
-                'outtmpl': output_template,
                 'quiet': False,
                 'no_warnings': False,
                 'progress_hooks': [tracker.progress_hook],
                 'ffmpeg_location': ffmpeg_location,  # 🔧 ADICIONADO
-                'merge_output_format': 'mp4',
                 'socket_timeout': 60,
                 'retries': 5,
             }
@@ -306,21 +764,14 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
     ]
 
     # Configuração específica para áudio
-    if request.audio_only:
+    if is_audio_request(request):
         audio_strategies = [
             {
                 'name': 'Best Audio',
                 'opts': {
-                    'format': 'ba/best',
-                    'outtmpl': output_template,
                     'quiet': False,
                     'progress_hooks': [tracker.progress_hook],
                     'ffmpeg_location': ffmpeg_location,  # 🔧 ADICIONADO
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '192',
-                    }],
                     'socket_timeout': 60,
                     'retries': 5,
                 }
@@ -328,89 +779,50 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
         ]
         download_strategies = audio_strategies
 
+    # Formato definido pela requisição (qualidade/container), igual para todas as estratégias
+    format_options = build_format_options(request)
+    logger.info(f"🎞️  Seleção de formato: {format_options['format']}")
+    for strategy in download_strategies:
+        strategy['opts'].update(format_options)
+
+    # Tempos por job, para medir o custo de cada fase
+    job_start = time.perf_counter()
+    job_timings: Dict[str, float] = {}
+
+    # Extração recente (ex.: feita pelo /video/info) com URLs ainda válidas
+    # permite começar o download sem extrair de novo
+    cached = metadata_cache.get(normalized_url, require_valid_urls=True)
+    cached_info = cached[0] if cached else None
+
+    # Ordenar pelo desempenho recente de cada estratégia nesta categoria
+    category = get_category(is_short, is_audio_request(request))
+    download_strategies = strategy_scoreboard.rank('download', category, download_strategies)
+
     last_error = None
     for strategy in download_strategies:
-        try:
-            tracker.set_strategy(strategy['name'])
-            logger.info(f"🔄 Tentando download com estratégia: {strategy['name']}")
-
-            with yt_dlp.YoutubeDL(strategy['opts']) as ydl:
-                # Primeiro obter info
-                info = ydl.extract_info(normalized_url, download=False)
-
-                if not info:
-                    logger.warning(f"⚠️ Estratégia {strategy['name']}: Não conseguiu obter informações do vídeo")
-                    continue
-
-                # Verificar se tem formatos de vídeo disponíveis (não apenas imagens)
-                formats = info.get('formats', [])
-                video_formats = [f for f in formats if f.get('vcodec') != 'none' and 'storyboard' not in f.get('format_id', '').lower() and 'sb' != f.get('format_id', '')]
-
-                if not video_formats:
-                    logger.warning(f"⚠️ Estratégia {strategy['name']}: Apenas storyboards disponíveis, pulando...")
-                    continue
-
-                logger.info(f"✅ Info obtida, iniciando download...")
-                logger.info(f"📹 Título: {info.get('title', 'N/A')}")
-                logger.info(f"⏱️  Duração: {info.get('duration', 'N/A')} segundos")
-                logger.info(f"📊 Formatos de vídeo disponíveis: {len(video_formats)}")
-
-                # Depois fazer download
-                ydl.download([normalized_url])
-
-                logger.info(f"✅ Download bem-sucedido com estratégia: {strategy['name']}")
-
-                # Se não for áudio, processar o arquivo
-                if not request.audio_only:
-                    if progress_callback:
-                        progress_callback(DownloadProgress(
-                            status='converting',
-                            progress_percent=100.0,
-                            current_strategy=strategy['name'],
-                            message='Convertendo para MP4...'
-                        ))
-
-                    final_filename = find_and_convert_latest_video()
-                    if final_filename:
-                        logger.info(f"✅ Arquivo final processado: {final_filename}")
-                        # Validar que o arquivo final tem conteúdo de vídeo real
-                        final_path = os.path.join(DOWNLOAD_DIR, final_filename)
-                        if os.path.exists(final_path):
-                            file_size = os.path.getsize(final_path) / (1024 * 1024)  # MB
-                            logger.info(f"📦 Tamanho do arquivo: {file_size:.2f} MB")
-
-                            # Verificar se não é um storyboard (arquivo muito pequeno)
-                            if file_size < 1.0:
-                                logger.error(f"❌ Arquivo muito pequeno ({file_size:.2f} MB), provavelmente é storyboard")
-                                continue
-
-                        if progress_callback:
-                            progress_callback(DownloadProgress(
-                                status='completed',
-                                progress_percent=100.0,
-                                current_strategy=strategy['name'],
-                                message='Download concluído com sucesso!',
-                                filename=final_filename
-                            ))
-
-                        return info
-                    else:
-                        logger.warning("⚠️ Conversão não produziu arquivo final, tentando próxima estratégia...")
-                        continue
-                else:
-                    if progress_callback:
-                        progress_callback(DownloadProgress(
-                            status='completed',
-                            progress_percent=100.0,
-                            current_strategy=strategy['name'],
-                            message='Download de áudio concluído!'
-                        ))
-                    return info
+        if not circuit_breakers.allow('download', strategy['name']):
+            logger.info(f"🔌 Estratégia {strategy['name']} em cooldown, pulando...")
+            continue
 
+        tracker.set_strategy(strategy['name'])
+        try:
+            info = _run_download_strategy(
+                strategy, normalized_url, request, tracker, progress_callback, job_timings, category, cached_info
+            )
+        except TerminalJobError:
+            # Orçamento estourado / disco cheio: nenhuma outra estratégia vai resolver.
+            # A extração já tinha dado certo, então o client está respondendo
+            circuit_breakers.record_success('download', strategy['name'])
+            raise
         except Exception as e:
             error_msg = str(e)
             logger.error(f"❌ Estratégia {strategy['name']} falhou: {error_msg}")
 
+            # Erro terminal: nenhuma outra estratégia vai resolver (e a estratégia não tem culpa)
+            if classify_error(e)[1]:
+                circuit_breakers.release('download', strategy['name'])
+            check_terminal_error(normalized_url, e)
+
             if progress_callback:
                 progress_callback(DownloadProgress(
                     status='error',
@@ -418,80 +830,31 @@ def download_video_robust(url: str, request: VideoRequest, progress_callback: Op
                     message=f'Estratégia falhou: {error_msg}'
                 ))
 
+            _record_attempt('download', category, strategy['name'], success=False)
             last_error = e
             continue
+        finally:
+            cached_info = None  # usar o cache apenas na primeira tentativa
+
+        if info is None:
+            _record_attempt('download', category, strategy['name'], success=False)
+            continue
+
+        _record_attempt(
+            'download', category, strategy['name'], success=True,
+            ttfb=tracker.time_to_first_byte(), throughput=tracker.throughput()
+        )
+        _log_job_timings(info, job_timings, job_start, strategy['name'])
+        result_store.record(request, info)
+        return info
+
+    if last_error is None and tracker.strategy_attempts == 0:
+        raise TerminalJobError(
+            'strategies_cooldown', 503,
+            "❌ Todas as estratégias de download estão em cooldown após falhas recentes. Tente novamente em alguns minutos."
+        )
 
     raise HTTPException(
         status_code=400,
         detail=f"❌ Todas as estratégias de download falharam. O YouTube pode estar bloqueando o acesso ou o yt-dlp está desatualizado. Execute: pip install --upgrade yt-dlp. Último erro: {str(last_error)}"
     )
-
-def get_available_formats(url: str) -> list:
-    """Obtém lista de formatos disponíveis para o vídeo"""
-    try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'listformats': True,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android'],
-                }
-            }
-        }
-
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            formats = info.get('formats', [])
-
-            # Filtrar apenas formatos de vídeo válidos
-            video_formats = []
-            for fmt in formats:
-                if (fmt.get('vcodec') and fmt.get('vcodec') != 'none' and
-                    fmt.get('ext') in ['mp4', 'webm', 'mkv']):
-                    video_formats.append({
-                        'format_id': fmt.get('format_id'),
-                        'ext': fmt.get('ext'),
-                        'quality': fmt.get('height', 0),
-                        'vcodec': fmt.get('vcodec'),
-                        'acodec': fmt.get('acodec'),
-                        'filesize': fmt.get('filesize', 0)
-                    })
-
-            logger.info(f"Formatos disponíveis encontrados: {len(video_formats)}")
-            return video_formats
-
-    except Exception as e:
-        logger.warning(f"Erro ao obter formatos disponíveis: {str(e)}")
-        return []
-
-def select_best_format(formats: list) -> str:
-    """Seleciona o melhor formato disponível baseado na qualidade e compatibilidade"""
-    if not formats:
-        return 'best'
-
-    # Ordenar por qualidade (altura) e preferir MP4
-    mp4_formats = [f for f in formats if f['ext'] == 'mp4']
-    webm_formats = [f for f in formats if f['ext'] == 'webm']
-
-    # Priorizar MP4 com boa qualidade
-    if mp4_formats:
-        # Ordenar por qualidade decrescente
-        mp4_formats.sort(key=lambda x: x['quality'], reverse=True)
-        best_mp4 = mp4_formats[0]
-
-        # Se tem qualidade >= 720p, usar esse
-        if best_mp4['quality'] >= 720:
-            return best_mp4['format_id']
-
-        # Senão, usar o melhor MP4 disponível
-        return best_mp4['format_id']
-
-    # Se não tem MP4, usar WebM
-    elif webm_formats:
-        webm_formats.sort(key=lambda x: x['quality'], reverse=True)
-        return webm_formats[0]['format_id']
-
-    # Fallback para o primeiro formato disponível
-    formats.sort(key=lambda x: x['quality'], reverse=True)
-    return formats[0]['format_id']
@@ -31,6 +31,26 @@ def get_downloads_dir():
 
 DOWNLOAD_DIR = get_downloads_dir()
 
+# Diretórios de trabalho por job: no mesmo sistema de arquivos do DOWNLOAD_DIR
+# para que o arquivo final seja movido atomicamente (os.replace)
+JOBS_DIR = os.path.join(DOWNLOAD_DIR, '.jobs')
+
+# Diretório de estado interno (placar de estratégias, índices) - fora do DOWNLOAD_DIR
+# para não aparecer na listagem de downloads
+def get_state_dir():
+    """Obtém o diretório de estado persistente da API"""
+    if os.environ.get('STATE_DIR'):
+        state_dir = Path(os.environ.get('STATE_DIR'))
+    elif os.environ.get('RENDER'):
+        state_dir = Path('/tmp/video_api_state')
+    else:
+        state_dir = Path.home() / ".youtube_downloader"
+
+    state_dir.mkdir(parents=True, exist_ok=True)
+    return str(state_dir)
+
+STATE_DIR = get_state_dir()
+
 # Configurações do CORS - permitir frontend
 CORS_ORIGINS = [
     "http://localhost:3000",
@@ -52,3 +72,94 @@ API_DESCRIPTION = "API para download de vídeos do YouTube com suporte a streami
 # Porta para o servidor (Render usa a variável PORT)
 PORT = int(os.environ.get('PORT', 8000))
 HOST = os.environ.get('HOST', '0.0.0.0')
+
+# Executores dedicados para trabalho bloqueante (yt-dlp, ffmpeg, subprocess, disco)
+# Downloads são longos e pesados; o pool de I/O atende probes e listagens rápidas
+DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', 2))
+IO_WORKERS = int(os.environ.get('IO_WORKERS', 4))
+# Jobs de download aguardando um worker livre; acima disso a requisição é recusada
+DOWNLOAD_QUEUE_SIZE = int(os.environ.get('DOWNLOAD_QUEUE_SIZE', 20))
+
+# Cache de metadados (info do yt-dlp) por ID do vídeo
+# TTL: idade até a qual a entrada é considerada fresca
+# MAX_STALE: idade máxima servida enquanto revalida em segundo plano
+# DIR: diretório opcional para o cache em disco (desativado se vazio)
+METADATA_CACHE_SIZE = int(os.environ.get('METADATA_CACHE_SIZE', 256))
+METADATA_CACHE_TTL = int(os.environ.get('METADATA_CACHE_TTL', 600))
+METADATA_CACHE_MAX_STALE = int(os.environ.get('METADATA_CACHE_MAX_STALE', 6 * 3600))
+METADATA_CACHE_DIR = os.environ.get('METADATA_CACHE_DIR', '')
+# Margem de segurança antes da expiração das URLs assinadas dos formatos
+SIGNED_URL_EXPIRY_MARGIN = int(os.environ.get('SIGNED_URL_EXPIRY_MARGIN', 300))
+
+# Placar de estratégias: ordena as estratégias pelo histórico recente
+# DECAY: peso do histórico a cada nova tentativa (menor = adapta mais rápido)
+STRATEGY_SCOREBOARD_PATH = os.environ.get(
+    'STRATEGY_SCOREBOARD_PATH', os.path.join(STATE_DIR, 'strategy_scoreboard.json')
+)
+STRATEGY_SCOREBOARD_DECAY = float(os.environ.get('STRATEGY_SCOREBOARD_DECAY', 0.9))
+
+# Circuit breaker por estratégia: abre após N falhas consecutivas e
+# libera uma única tentativa de teste quando o cooldown termina
+CIRCUIT_BREAKER_THRESHOLD = int(os.environ.get('CIRCUIT_BREAKER_THRESHOLD', 3))
+CIRCUIT_BREAKER_COOLDOWN = int(os.environ.get('CIRCUIT_BREAKER_COOLDOWN', 300))
+
+# Cache negativo: vídeos com erro terminal (privado, removido...) falham na hora
+NEGATIVE_CACHE_TTL = int(os.environ.get('NEGATIVE_CACHE_TTL', 300))
+NEGATIVE_CACHE_SIZE = int(os.environ.get('NEGATIVE_CACHE_SIZE', 1024))
+
+# Modo hedged para extração de metadados: inicia a melhor estratégia e, se não
+# houver resposta em INFO_HEDGE_DELAY segundos, dispara a próxima em paralelo
+INFO_HEDGING = os.environ.get('INFO_HEDGING', '').lower() in ('1', 'true', 'yes')
+INFO_HEDGE_DELAY = float(os.environ.get('INFO_HEDGE_DELAY', 3.0))
+# No máximo 2 tentativas simultâneas por requisição: nunca mais que o dobro de requisições
+INFO_HEDGE_MAX_PARALLEL = int(os.environ.get('INFO_HEDGE_MAX_PARALLEL', 2))
+
+# Índice de resultados: (vídeo, formato, container, áudio) -> arquivo já baixado
+RESULT_INDEX_PATH = os.environ.get('RESULT_INDEX_PATH', os.path.join(STATE_DIR, 'result_index.json'))
+
+# Orçamento de tamanho/tempo e checagem de espaço em disco antes do download
+# Throughput assumido quando o placar ainda não tem medição para a estratégia
+BUDGET_DEFAULT_THROUGHPUT = int(os.environ.get('BUDGET_DEFAULT_THROUGHPUT', 2 * 1024 * 1024))
+# Espaço necessário = estimativa × fator (download + cópia convertida) + reserva
+DISK_SPACE_FACTOR = float(os.environ.get('DISK_SPACE_FACTOR', 2.0))
+DISK_SPACE_RESERVE = int(os.environ.get('DISK_SPACE_RESERVE', 100 * 1024 * 1024))
+
+# Triagem de formatos antes do download: bitrates (kbit/s) fora desta faixa são
+# considerados implausíveis (storyboards têm tbr perto de zero)
+FORMAT_MIN_VIDEO_TBR = float(os.environ.get('FORMAT_MIN_VIDEO_TBR', 30))
+FORMAT_MIN_AUDIO_TBR = float(os.environ.get('FORMAT_MIN_AUDIO_TBR', 8))
+FORMAT_MAX_TBR = float(os.environ.get('FORMAT_MAX_TBR', 200000))
+
+# Timeout do ffmpeg proporcional à duração do vídeo:
+# base + duração × segundos por segundo de mídia (× fator ao recodificar)
+FFMPEG_TIMEOUT_BASE = float(os.environ.get('FFMPEG_TIMEOUT_BASE', 60))
+FFMPEG_TIMEOUT_PER_SECOND = float(os.environ.get('FFMPEG_TIMEOUT_PER_SECOND', 1.0))
+FFMPEG_REENCODE_TIMEOUT_FACTOR = float(os.environ.get('FFMPEG_REENCODE_TIMEOUT_FACTOR', 4.0))
+# Usado quando a duração é desconhecida (valor fixo antigo)
+FFMPEG_TIMEOUT_DEFAULT = float(os.environ.get('FFMPEG_TIMEOUT_DEFAULT', 300))
+
+# Cache de probes do ffprobe por (caminho, tamanho, mtime)
+PROBE_CACHE_SIZE = int(os.environ.get('PROBE_CACHE_SIZE', 512))
+
+# Modo de saída MP4 padrão: 'faststart' (moov no início, 2 passadas de escrita)
+# ou 'fragmented' (MP4 fragmentado, transmissível desde o primeiro byte, 1 passada)
+MP4_OUTPUT_MODE = os.environ.get('MP4_OUTPUT_MODE', 'faststart').lower()
+
+# Áudio sem formato específico (format='audio' ou audio_only): 'passthrough' entrega o
+# melhor áudio nativo só remuxado (m4a/opus); 'mp3' recodifica sempre, como antes
+AUDIO_OUTPUT_MODE = os.environ.get('AUDIO_OUTPUT_MODE', 'passthrough').lower()
+
+# MP3 pedido explicitamente: transcodificar durante o download, com os bytes indo direto
+# para o stdin do ffmpeg (sem arquivo intermediário). Requisições Range de até
+# AUDIO_STREAM_RANGE_SIZE bytes (o YouTube limita a velocidade de respostas maiores)
+AUDIO_STREAM_TRANSCODE = os.environ.get('AUDIO_STREAM_TRANSCODE', 'true').lower() in ('1', 'true', 'yes')
+AUDIO_STREAM_RANGE_SIZE = int(os.environ.get('AUDIO_STREAM_RANGE_SIZE', 10 * 1024 * 1024))
+
+# Recodificação paralela: vídeos com pelo menos PARALLEL_REENCODE_MIN_DURATION segundos são
+# cortados nos keyframes e recodificados por até PARALLEL_REENCODE_WORKERS ffmpegs simultâneos
+PARALLEL_REENCODE = os.environ.get('PARALLEL_REENCODE', 'true').lower() in ('1', 'true', 'yes')
+PARALLEL_REENCODE_WORKERS = int(os.environ.get('PARALLEL_REENCODE_WORKERS', os.cpu_count() or 1))
+PARALLEL_REENCODE_MIN_DURATION = float(os.environ.get('PARALLEL_REENCODE_MIN_DURATION', 120))
+
+# Baixar os streams de vídeo e áudio de um par DASH ao mesmo tempo (em vez de um depois do outro)
+DASH_CONCURRENT_STREAMS = os.environ.get('DASH_CONCURRENT_STREAMS', 'true').lower() in ('1', 'true', 'yes')
@@ -1,26 +1,33 @@
 import re
 import logging
 import os
+from typing import Optional
 from ..utils.config import DOWNLOAD_DIR
 
 logger = logging.getLogger(__name__)
 
-def normalize_youtube_url(url: str) -> str:
-    """Normaliza URLs do YouTube para formato padrão"""
-    # Remover parâmetros desnecessários e normalizar
-    video_id_patterns = [
-        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/|youtube\.com\/shorts\/)([a-zA-Z0-9_-]{11})',
-        r'youtube\.com\/.*[?&]v=([a-zA-Z0-9_-]{11})'
-    ]
+VIDEO_ID_PATTERNS = [
+    r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/|youtube\.com\/shorts\/)([a-zA-Z0-9_-]{11})',
+    r'youtube\.com\/.*[?&]v=([a-zA-Z0-9_-]{11})'
+]
 
-    for pattern in video_id_patterns:
+def extract_video_id(url: str) -> Optional[str]:
+    """Extrai o ID canônico (11 caracteres) de uma URL do YouTube"""
+    for pattern in VIDEO_ID_PATTERNS:
         match = re.search(pattern, url)
         if match:
-            video_id = match.group(1)
-            if '/shorts/' in url.lower():
-                return f"https://www.youtube.com/shorts/{video_id}"
-            else:
-                return f"https://www.youtube.com/watch?v={video_id}"
+            return match.group(1)
+    return None
+
+def normalize_youtube_url(url: str) -> str:
+    """Normaliza URLs do YouTube para formato padrão"""
+    # Remover parâmetros desnecessários e normalizar
+    video_id = extract_video_id(url)
+    if video_id:
+        if '/shorts/' in url.lower():
+            return f"https://www.youtube.com/shorts/{video_id}"
+        else:
+            return f"https://www.youtube.com/watch?v={video_id}"
 
     return url
 
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do pipeline de mídia (probe, conversão, saída MP4...)
+
+Uso:
+    python benchmark_media.py probe [arquivo ...]
+    python benchmark_media.py convert [arquivo ...]
+    python benchmark_media.py mp4mode [arquivo ...]
+    python benchmark_media.py postprocess [arquivo ...]
+    python benchmark_media.py audio [arquivo ...]
+    python benchmark_media.py parallel [arquivo ...]
+    python benchmark_media.py reuse [url ou arquivo ...]
+
+Sem arquivos, gera amostras sintéticas com o ffmpeg em um diretório temporário.
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.ffmpeg_locator import get_ffmpeg_path, get_ffprobe_path
+from app.services.container_parser import parse_header
+from app.services.media_probe import _run_ffprobe, probe_file
+from app.models.schemas import VideoRequest
+from app.services.ffmpeg_runner import run_ffmpeg
+from app.services.parallel_encode import parallel_reencode
+from app.services.postprocess_planner import execute_plan, plan_postprocessing
+from app.services.video_converter import MP4_MOVFLAGS
+
+def make_sample(directory, name, seconds=60, size='1280x720', extra=None):
+    """Gera um vídeo de teste (testsrc + seno) com o ffmpeg"""
+    path = os.path.join(directory, name)
+    if name.endswith('.webm'):
+        codecs = ['-c:v', 'libvpx-vp9', '-deadline', 'realtime', '-cpu-used', '8', '-b:v', '1M', '-c:a', 'libopus']
+    else:
+        codecs = ['-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac']
+    cmd = [
+        get_ffmpeg_path(), '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc=size={size}:rate=30',
+        '-f', 'lavfi', '-i', 'sine=frequency=440',
+        '-t', str(seconds), *codecs, *(extra or []), path
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+def timeit(func, repeat):
+    """Tempo médio por chamada em milissegundos"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def validate_with_two_ffprobes(path):
+    """Caminho antigo do validate_video_file: um ffprobe para a duração e outro para os frames"""
+    ffprobe = get_ffprobe_path()
+    subprocess.run([ffprobe, '-v', 'quiet', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+                   capture_output=True, text=True, timeout=30)
+    subprocess.run([ffprobe, '-v', 'quiet', '-select_streams', 'v:0',
+                    '-show_entries', 'stream=nb_frames,r_frame_rate', '-of', 'csv=p=0', path],
+                   capture_output=True, text=True, timeout=30)
+
+def bench_probe(paths, repeat=20):
+    print("🔍 Probe: validate_video_file antigo (2× ffprobe) × ffprobe JSON único × parser de cabeçalho\n")
+    print(f"{'arquivo':<20} {'2× ffprobe':>12} {'1× ffprobe':>12} {'cabeçalho':>12} {'ganho':>8}")
+    for path in paths:
+        old = timeit(lambda: validate_with_two_ffprobes(path), repeat)
+        single = timeit(lambda: _run_ffprobe(path), repeat)
+        try:
+            header = timeit(lambda: parse_header(path), repeat * 10)
+            header_text = f"{header:10.3f}ms"
+            gain = f"{old / header:7.0f}×"
+        except Exception as e:
+            header_text, gain = 'n/a', '-'
+            print(f"   ⚠️  {os.path.basename(path)}: {e}")
+        print(f"{os.path.basename(path):<20} {old:10.2f}ms {single:10.2f}ms {header_text:>12} {gain:>8}")
+
+def bench_convert(paths):
+    print("🔄 Conversão para MP4: plano escolhido pelo planejador × recodificação completa (fallback)\n")
+    print(f"{'arquivo':<20} {'caminho':<22} {'tempo':>8} {'MB/s':>8} {'× tempo real':>13}")
+    request = VideoRequest(url='https://www.youtube.com/watch?v=benchmark', format='mp4')
+    for path in paths:
+        probe = probe_file(path)
+        duration = probe.duration if probe else None
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        workdir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(workdir, 'input' + os.path.splitext(path)[1])
+            shutil.copy(path, source)
+            plan = plan_postprocessing([source], [{'ext': os.path.splitext(path)[1].lstrip('.')}], request,
+                                       os.path.join(workdir, 'output'))
+            fallback_args = plan.fallback_args
+            start = time.perf_counter()
+            result = execute_plan(plan, duration)
+            runs = [(f'plano ({plan.kind}) ⭐', time.perf_counter() - start, result is not None)]
+            if fallback_args:
+                start = time.perf_counter()
+                ok = run_ffmpeg(fallback_args, duration).ok
+                runs.append(('recodificação', time.perf_counter() - start, ok))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        for label, elapsed, ok in runs:
+            status = '' if ok else '  ❌ falhou'
+            if plan.args is None and label.startswith('plano'):
+                # Nada a converter: o arquivo baixado é servido como está
+                print(f"{os.path.basename(path):<20} {label:<22} {elapsed:7.2f}s {'-':>8} {'-':>13}{status}")
+                continue
+            realtime = f"{duration / elapsed:11.1f}×" if duration else 'n/a'
+            print(f"{os.path.basename(path):<20} {label:<22} {elapsed:7.2f}s {size_mb / elapsed:8.1f} {realtime:>13}{status}")
+    print("\n⭐ = caminho escolhido pelo planejador para o arquivo")
+
+def run_and_measure_io(cmd):
+    """Executa o comando e retorna (segundos, bytes lidos, bytes escritos) do processo (Linux)"""
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    read_bytes = written_bytes = None
+    if hasattr(os, 'waitid'):
+        # Espera o fim sem colher o processo, para ainda poder ler /proc/<pid>/io
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        try:
+            with open(f'/proc/{process.pid}/io') as f:
+                counters = dict(line.split(': ') for line in f.read().splitlines())
+            read_bytes, written_bytes = int(counters['rchar']), int(counters['wchar'])
+        except OSError:
+            pass
+    process.wait()
+    return time.perf_counter() - start, read_bytes, written_bytes
+
+def bench_mp4mode(paths, repeat=3):
+    print("📦 Saída MP4: +faststart × fragmentado (frag_keyframe+empty_moov+default_base_moof), remux\n")
+    print(f"{'arquivo':<20} {'modo':<11} {'tempo':>8} {'lido':>10} {'escrito':>10} {'arquivo final':>14}")
+    mb = lambda value: f"{value / (1024 * 1024):8.1f}MB" if value is not None else 'n/a'
+    for path in paths:
+        for mode, movflags in MP4_MOVFLAGS.items():
+            workdir = tempfile.mkdtemp()
+            try:
+                output = os.path.join(workdir, 'output.mp4')
+                cmd = [get_ffmpeg_path(), '-v', 'error', '-y', '-i', path, '-c', 'copy', '-movflags', movflags, output]
+                runs = [run_and_measure_io(cmd) for _ in range(repeat)]
+                elapsed = min(run[0] for run in runs)
+                _, read_bytes, written_bytes = runs[-1]
+                size = os.path.getsize(output)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            print(f"{os.path.basename(path):<20} {mode:<11} {elapsed:7.3f}s {mb(read_bytes):>10} {mb(written_bytes):>10} {mb(size):>14}")
+
+def legacy_audio_chain(source, workdir):
+    """Pipeline antigo para áudio DASH: FixupM4a (cópia) e depois FFmpegExtractAudio para MP3"""
+    ffmpeg = get_ffmpeg_path()
+    fixed = os.path.join(workdir, 'fixed.m4a')
+    return [
+        [ffmpeg, '-v', 'error', '-y', '-i', source, '-map', '0', '-c', 'copy', '-f', 'mp4', fixed],
+        [ffmpeg, '-v', 'error', '-y', '-i', fixed, '-vn', '-c:a', 'libmp3lame', '-b:a', '192k', os.path.join(workdir, 'legacy.mp3')],
+    ]
+
+def bench_postprocess(paths):
+    print("🧩 Pós-processamento: cadeia antiga do yt-dlp (fixup + extração de áudio) × plano de um único ffmpeg\n")
+    print(f"{'arquivo':<20} {'pipeline':<22} {'passadas':>9} {'tempo':>8} {'lido':>10} {'escrito':>10}")
+    mb = lambda value: f"{value / (1024 * 1024):8.1f}MB" if value is not None else 'n/a'
+    for path in paths:
+        workdir = tempfile.mkdtemp()
+        try:
+            source = os.path.join(workdir, 'source.f140' + os.path.splitext(path)[1])
+            shutil.copy(path, source)
+            plan = plan_postprocessing([source], [{'ext': 'm4a', 'container': 'm4a_dash'}],
+                                       VideoRequest(url='https://www.youtube.com/watch?v=benchmark', format='mp3'), os.path.join(workdir, 'planned'))
+            chains = {
+                'antigo (2 passadas)': legacy_audio_chain(source, workdir),
+                f'plano ({plan.kind})': [[get_ffmpeg_path(), '-v', 'error', *plan.args]] if plan.args else [],
+            }
+            for label, commands in chains.items():
+                elapsed = read_total = written_total = 0
+                for cmd in commands:
+                    seconds, read_bytes, written_bytes = run_and_measure_io(cmd)
+                    elapsed += seconds
+                    read_total += read_bytes or 0
+                    written_total += written_bytes or 0
+                print(f"{os.path.basename(path):<20} {label:<22} {len(commands):>9} {elapsed:7.2f}s "
+                      f"{mb(read_total):>10} {mb(written_total):>10}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+def bench_audio(paths):
+    print("🎵 Áudio: tempo de CPU por hora de áudio em cada modo (passthrough × recodificação)\n")
+    print(f"{'arquivo':<20} {'modo':<8} {'plano':<14} {'saída':<8} {'CPU':>8} {'CPU/hora':>10}")
+    for path in paths:
+        probe = probe_file(path)
+        duration = probe.duration if probe else None
+        for mode in ('audio', 'm4a', 'opus', 'mp3'):
+            workdir = tempfile.mkdtemp()
+            try:
+                source = os.path.join(workdir, 'source' + os.path.splitext(path)[1])
+                shutil.copy(path, source)
+                request = VideoRequest(url='https://www.youtube.com/watch?v=benchmark', format=mode)
+                ext = os.path.splitext(path)[1].lstrip('.')
+                # Áudio m4a do YouTube chega como DASH (m4a_dash)
+                fmt = {'ext': ext, 'container': 'm4a_dash' if ext == 'm4a' else None}
+                plan = plan_postprocessing([source], [fmt], request, os.path.join(workdir, 'output'))
+                cpu = (run_ffmpeg(plan.args, duration).cpu_seconds or 0.0) if plan.args else 0.0
+                output = os.path.splitext(plan.output_path)[1].lstrip('.')
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            per_hour = f"{cpu / duration * 3600:9.1f}s" if duration else 'n/a'
+            label = 'nativo' if mode == 'audio' else mode
+            print(f"{os.path.basename(path):<20} {label:<8} {plan.kind:<14} {output:<8} {cpu:7.2f}s {per_hour:>10}")
+
+def bench_parallel(paths):
+    print("🧱 Recodificação libx264: um só processo × segmentos de keyframe em paralelo\n")
+    print(f"{'arquivo':<20} {'workers':>8} {'tempo':>8} {'speedup':>8} {'duração':>10} {'entrada':>10}")
+    video_args = ['-c:v', 'libx264', '-preset', 'fast', '-crf', '23']
+    audio_args = ['-c:a', 'aac', '-b:a', '128k']
+    cores = os.cpu_count() or 1
+    counts = sorted({2, *(2 ** i for i in range(1, cores.bit_length() + 1) if 2 ** i <= cores), cores})
+    for path in paths:
+        probe = probe_file(path)
+        duration = probe.duration if probe else None
+        workdir = tempfile.mkdtemp()
+        try:
+            output = os.path.join(workdir, 'output.mp4')
+            start = time.perf_counter()
+            run_ffmpeg(['-y', '-i', path, *video_args, *audio_args, output], duration)
+            baseline = time.perf_counter() - start
+            single = probe_file(output)
+            print(f"{os.path.basename(path):<20} {'1 (único)':>8} {baseline:7.1f}s {'1.00×':>8} "
+                  f"{single.duration if single else 0:9.2f}s {duration or 0:9.2f}s")
+            for workers in counts:
+                if os.path.exists(output):
+                    os.remove(output)
+                start = time.perf_counter()
+                ok = parallel_reencode(path, path, output, video_args, audio_args, [], duration, None, workers)
+                elapsed = time.perf_counter() - start
+                result = probe_file(output) if ok else None
+                status = '' if ok else '  ❌ falhou (duração divergente ou erro)'
+                print(f"{os.path.basename(path):<20} {workers:>8} {elapsed:7.1f}s {baseline / elapsed:7.2f}× "
+                      f"{result.duration if result else 0:9.2f}s {duration or 0:9.2f}s{status}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print(f"\n{cores} núcleo(s) nesta máquina; o speedup só aparece com workers ≤ núcleos")
+
+def serve_files(paths, directory):
+    """Serve os arquivos locais por HTTP (localhost) e retorna (servidor, URLs)"""
+    for path in paths:
+        os.symlink(os.path.abspath(path), os.path.join(directory, os.path.basename(path)))
+    class QuietHandler(SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class QuietServer(ThreadingHTTPServer):
+        def handle_error(self, request, client_address):
+            pass  # o extrator genérico fecha a conexão depois de ler o começo do arquivo
+
+    server = QuietServer(('127.0.0.1', 0), partial(QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    return server, [f"http://127.0.0.1:{port}/{os.path.basename(path)}" for path in paths]
+
+def time_job(url, reuse):
+    """(extração, download, total) de um job: download pelo info já extraído ou por ydl.download([url])"""
+    workdir = tempfile.mkdtemp()
+    try:
+        opts = {'quiet': True, 'no_warnings': True, 'noprogress': True, 'outtmpl': os.path.join(workdir, '%(id)s.%(ext)s')}
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            start = time.perf_counter()
+            info = ydl.extract_info(url, download=False)
+            extracted = time.perf_counter()
+            if reuse:
+                ydl.process_ie_result(info, download=True)
+            else:
+                ydl.download([url])  # extrai tudo de novo antes de baixar
+        end = time.perf_counter()
+        return extracted - start, end - extracted, end - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def bench_reuse(targets, repeat=10):
+    print("♻️  Job de download: extract_info + ydl.download([url]) × extract_info + process_ie_result\n")
+    print(f"{'alvo':<24} {'caminho':<22} {'extração':>9} {'download':>9} {'total':>8} {'ganho':>8}")
+    files = [target for target in targets if os.path.isfile(target)]
+    urls = [target for target in targets if not os.path.isfile(target)]
+    served = tempfile.mkdtemp()
+    server = None
+    try:
+        if files:
+            server, local_urls = serve_files(files, served)
+            urls += local_urls
+        for url in urls:
+            name = url.rstrip('/').rsplit('/', 1)[-1][:24]
+            # Melhor de `repeat` rodadas, alternando os caminhos para não favorecer nenhum com cache quente
+            runs = {False: [], True: []}
+            for _ in range(repeat):
+                for reuse in (False, True):
+                    runs[reuse].append(time_job(url, reuse))
+            baseline = min(run[2] for run in runs[False])
+            for reuse, label in ((False, 'antigo (2× extração)'), (True, 'info reaproveitado')):
+                extract, download, total = min(runs[reuse], key=lambda run: run[2])
+                gain = f"{(baseline - total) / baseline * 100:6.1f}%" if reuse else '-'
+                print(f"{name:<24} {label:<22} {extract:8.3f}s {download:8.3f}s {total:7.3f}s {gain:>8}")
+    finally:
+        if server:
+            server.shutdown()
+        shutil.rmtree(served, ignore_errors=True)
+    print("\nA fase de download do caminho antigo inclui a segunda extração (página, player JS, assinaturas)")
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__)
+        sys.exit(1)
+
+    name, files = sys.argv[1], sys.argv[2:]
+    with tempfile.TemporaryDirectory() as tmp:
+        if not files:
+            print("🎬 Gerando amostras sintéticas...\n")
+            files = [
+                make_sample(tmp, 'sample.mp4', extra=['-movflags', '+faststart']),
+                make_sample(tmp, 'sample.webm'),
+                make_sample(tmp, 'sample.m4a', extra=['-vn']),
+            ]
+        BENCHMARKS[name](files)
+
+BENCHMARKS = {
+    'probe': bench_probe,
+    'convert': bench_convert,
+    'mp4mode': bench_mp4mode,
+    'postprocess': bench_postprocess,
+    'audio': bench_audio,
+    'parallel': bench_parallel,
+    'reuse': bench_reuse,
+}
+
+if __name__ == '__main__':
+    main()
@@ -941,7 +941,8 @@ class YouTubeDownloaderGUI:
 
                 payload = {
                     "url": url,
-                    "format": self.format_var.get(),
+                    # O botão de áudio promete MP3: pedir explicitamente (o padrão do servidor é o áudio nativo)
+                    "format": 'mp3' if self.format_var.get() == 'audio' else self.format_var.get(),
                     "quality": self.quality_var.get(),
                     "audio_only": (self.format_var.get() == 'audio')
                 }
@@ -983,7 +984,7 @@ class YouTubeDownloaderGUI:
                         elif status == 'processing':
                             self.queue.put(('status', 'Processando vídeo...'))
                         elif status == 'converting':
-                            self.queue.put(('status', 'Convertendo...'))
+                            self.queue.put(('status', event.get('message') or 'Convertendo...'))
                         elif status == 'completed':
                             self.queue.put(('status', 'Download concluído!'))
                             self.queue.put(('progress', 100))
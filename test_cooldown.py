@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Teste de regressão: com todos os circuit breakers abertos, as rotas respondem 503.
+
+O cooldown era levantado como HTTPException(503) e as rotas o reembrulhavam
+num 400 genérico ("Erro ao baixar vídeo: 503: ..."), então o cliente nunca
+via o 503 nem sabia que podia tentar de novo mais tarde.
+"""
+
+import asyncio
+import sys
+import time
+
+import pytest
+from fastapi import HTTPException
+
+URL = "https://www.youtube.com/watch?v=cooldown001"
+
+def all_open_registry():
+    """Registro de breakers em que toda estratégia já nasce aberta (cooldown em andamento)"""
+    from app.services.circuit_breaker import OPEN, CircuitBreakerRegistry
+
+    class AllOpenRegistry(CircuitBreakerRegistry):
+        def _breaker(self, scope, name):
+            return self._breakers.setdefault(f"{scope}:{name}", {
+                'state': OPEN,
+                'consecutive_failures': self.threshold,
+                'opened_at': time.time(),
+                'probe_in_flight': False,
+            })
+
+    return AllOpenRegistry(threshold=1, cooldown=3600)
+
+async def call_routes():
+    """Status HTTP de /video/info e /video/download com todas as estratégias em cooldown"""
+    from app.routes import video
+    from app.models.schemas import VideoRequest
+
+    statuses = {}
+    for name, route in (('info', video.get_video_information), ('download', video.download_video)):
+        try:
+            await route(VideoRequest(url=URL))
+            statuses[name] = 200
+        except HTTPException as e:
+            statuses[name] = e.status_code
+    return statuses
+
+def run_with_breakers_open():
+    from app.services import youtube
+    from app.services.metadata_cache import metadata_cache
+    from app.services.result_store import result_store
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(youtube, 'circuit_breakers', all_open_registry())
+        # Nada vindo do cache/índice local: as rotas precisam chegar às estratégias
+        patch.setattr(type(metadata_cache), 'get', lambda self, *args, **kwargs: None)
+        patch.setattr(type(result_store), 'lookup', lambda self, request: None)
+        return asyncio.run(call_routes())
+
+def test_routes_return_503_when_all_breakers_are_open():
+    statuses = run_with_breakers_open()
+    assert statuses == {'info': 503, 'download': 503}, statuses
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 TESTE: 503 com todas as estratégias em cooldown")
+    print("=" * 60)
+
+    statuses = run_with_breakers_open()
+    for name, status in statuses.items():
+        print(f"   {'✅' if status == 503 else '❌'} /video/{name}: {status}")
+    sys.exit(0 if all(status == 503 for status in statuses.values()) else 1)
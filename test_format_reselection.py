@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Teste de regressão: refazer a seleção de formatos não pode deixar restos da anterior.
+
+O yt-dlp só faz info.update(formato escolhido) ao reprocessar um info: se a
+seleção anterior era um par DASH (137+140), o requested_formats antigo
+sobrevivia a uma nova escolha de formato único e o job baixava/convertia o
+par em vez do formato pedido (orçamento de tamanho, áudio do cache).
+"""
+
+import sys
+
+import yt_dlp
+
+def fake_info():
+    """Extração mínima: vídeo DASH, áudio DASH e um progressivo"""
+    base = {'protocol': 'https'}
+    return {
+        'id': 'dQw4w9WgXcQ',
+        'title': 'fake',
+        'duration': 60,
+        'extractor': 'youtube',
+        'extractor_key': 'Youtube',
+        'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'formats': [
+            dict(base, format_id='18', ext='mp4', url='https://example.invalid/18', vcodec='avc1.42001E',
+                 acodec='mp4a.40.2', height=360, width=640, tbr=500),
+            dict(base, format_id='140', ext='m4a', url='https://example.invalid/140', vcodec='none',
+                 acodec='mp4a.40.2', abr=128, filesize=960_000),
+            dict(base, format_id='137', ext='mp4', url='https://example.invalid/137', vcodec='avc1.640028',
+                 acodec='none', height=1080, width=1920, tbr=4000, filesize=30_000_000),
+        ],
+    }
+
+def select(info, spec):
+    from app.services.youtube import _reselect_formats
+
+    with yt_dlp.YoutubeDL({'quiet': True, 'format': spec}) as ydl:
+        return _reselect_formats(ydl, info)
+
+def processed_dash_info():
+    with yt_dlp.YoutubeDL({'quiet': True, 'format': '137+140'}) as ydl:
+        info = ydl.process_ie_result(fake_info(), download=False)
+    assert [f['format_id'] for f in info['requested_formats']] == ['137', '140']
+    return info
+
+def test_budget_reselection_drops_dash_pair():
+    # Orçamento de tamanho troca o par 1080p pelo progressivo
+    info = select(processed_dash_info(), '18')
+    assert 'requested_formats' not in info
+    assert info['format_id'] == '18'
+    assert info['url'] == 'https://example.invalid/18'
+    # O filesize do par anterior não pode sobrar para as estimativas de tamanho/disco
+    assert 'filesize' not in info
+
+def test_cached_info_reselected_for_audio():
+    # Info do cache (processado para vídeo) reaproveitado num pedido de áudio
+    info = select(yt_dlp.YoutubeDL.sanitize_info(processed_dash_info()), 'bestaudio/best')
+    assert 'requested_formats' not in info
+    assert info['format_id'] == '140'
+    assert info['vcodec'] == 'none'
+    assert 'height' not in info
+
+def test_reselection_into_dash_pair():
+    with yt_dlp.YoutubeDL({'quiet': True, 'format': '18'}) as ydl:
+        info = ydl.process_ie_result(fake_info(), download=False)
+    info = select(info, '137+140')
+    assert [f['format_id'] for f in info['requested_formats']] == ['137', '140']
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("🧪 TESTE: nova seleção de formatos sem restos da anterior")
+    print("=" * 60)
+
+    failures = 0
+    for test in (test_budget_reselection_drops_dash_pair, test_cached_info_reselected_for_audio,
+                 test_reselection_into_dash_pair):
+        try:
+            test()
+            print(f"   ✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"   ❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)